@@ -0,0 +1,41 @@
+"""Add interview_turns
+
+Revision ID: 7c2e4b91a3f0
+Revises: 0a7c5537d15f
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e4b91a3f0'
+down_revision: Union[str, None] = '0a7c5537d15f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('interview_turns',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('session_id', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_text', sa.Text(), nullable=False),
+    sa.Column('ai_text', sa.Text(), nullable=False),
+    sa.Column('stt_ms', sa.Integer(), nullable=True),
+    sa.Column('llm_ms', sa.Integer(), nullable=True),
+    sa.Column('tts_ms', sa.Integer(), nullable=True),
+    sa.Column('total_ms', sa.Integer(), nullable=True),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_interview_turns_session_user_id', 'interview_turns', ['session_id', 'user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_interview_turns_session_user_id', table_name='interview_turns')
+    op.drop_table('interview_turns')
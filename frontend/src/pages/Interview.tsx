@@ -1,5 +1,6 @@
 import { useState, useRef, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import WebApp from '@twa-dev/sdk';
 import { useReactMediaRecorder } from 'react-media-recorder';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Mic, Square, ArrowLeft, Loader2, Volume2, Bot, Paperclip, Image as ImageIcon, X } from 'lucide-react';
@@ -20,6 +21,9 @@ export const Interview = () => {
   const [selectedImage, setSelectedImage] = useState<File | null>(null);
   const [imagePreview, setImagePreview] = useState<string | null>(null);
   
+  // ID сессии интервью: сервер выдает его на первом ходе, храним для восстановления после перезагрузки
+  const [sessionId, setSessionId] = useState<string | null>(() => localStorage.getItem('interviewSessionId'));
+
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
@@ -28,6 +32,34 @@ export const Interview = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages, isProcessing, imagePreview]);
 
+  // Восстанавливаем историю сессии с сервера (постранично, по курсору after_id)
+  useEffect(() => {
+    if (!sessionId) return;
+    const loadTurns = async () => {
+      const restored: ChatMessage[] = [];
+      let afterId: number | null = 0;
+      try {
+        while (afterId !== null) {
+          const response = await fetch(
+            `/api/interview/sessions/${sessionId}/turns?after_id=${afterId}&limit=100`,
+            { headers: { Authorization: `twa-init-data ${WebApp.initData}` } }
+          );
+          if (!response.ok) return;
+          const page = await response.json();
+          for (const turn of page.turns) {
+            restored.push({ role: 'user', text: turn.user_text }, { role: 'ai', text: turn.ai_text });
+          }
+          afterId = page.next_after_id;
+        }
+        setMessages(prev => (prev.length ? prev : restored));
+      } catch (error) {
+        console.error(error);
+      }
+    };
+    loadTurns();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
   // Обработка выбора картинки через input
   const handleImageSelect = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files[0]) {
@@ -66,17 +98,32 @@ export const Interview = () => {
       content: msg.text
     }));
     formData.append('history', JSON.stringify(historyPayload));
+    if (sessionId) {
+      formData.append('session_id', sessionId);
+    }
 
     try {
       const response = await fetch('/api/interview/chat', {
         method: 'POST',
+        // Бэкенд ставит ход в очередь по Telegram ID из initData
+        headers: { Authorization: `twa-init-data ${WebApp.initData}` },
         body: formData,
       });
 
+      if (response.status === 409) return; // Ход заменен более новым из этого же окна - ответ придет на него
+      if (response.status === 429) {
+        setMessages(prev => [...prev, { role: 'ai', text: "Слишком часто. Подожди немного." }]);
+        return;
+      }
       if (!response.ok) throw new Error('Ошибка сети');
 
       const data = await response.json();
 
+      if (data.session_id && data.session_id !== sessionId) {
+        setSessionId(data.session_id);
+        localStorage.setItem('interviewSessionId', data.session_id);
+      }
+
       // Добавляем сообщения в чат (включая картинку пользователя, если была)
       setMessages(prev => [
         ...prev, 
@@ -1,7 +1,10 @@
-from aiogram import Router
+from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import Command
 
+from src.bot.tasks import chat_pool
+from src.bot.voice import run_voice_turn
+
 # Создаем роутер для регистрации обработчиков.
 # Это позволяет нам модульно подключать логику.
 router = Router()
@@ -12,9 +15,16 @@ async def command_start_handler(message: Message) -> None:
     """Обрабатывает команду /start и приветствует пользователя."""
     await message.answer(
         f"Привет, {message.from_user.full_name}! Я - твой Resume Killer и Mock Interviewer. "
-        "Ядро запущено (FastAPI + Aiogram)."
+        "Ядро запущено (FastAPI + Aiogram). Пришли голосовое - начнем собеседование."
     )
 
+# Голосовое интервью
+@router.message(F.voice)
+async def voice_handler(message: Message) -> None:
+    """Ставит ход интервью в фон: диспетчер не ждет STT/LLM/TTS."""
+    if not chat_pool.spawn(message.chat.id, run_voice_turn(message)):
+        await message.answer("Подожди, я еще отвечаю на предыдущие голосовые.")
+
 # Эхо-обработчик
 @router.message()
 async def echo_handler(message: Message) -> None:
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from src.config import settings
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Пул задач бота по чатам ---
+# Хэндлер не ждет долгий ход (STT -> LLM -> TTS), а кладет его сюда и сразу
+# возвращает управление диспетчеру. Внутри одного чата ходы идут по очереди
+# (чтобы не путалась история), всего одновременно - не больше max_concurrency.
+
+
+class ChatTaskPool:
+    def __init__(self, max_concurrency: int, max_pending_per_chat: int):
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._chat_locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._pending: dict[int, int] = defaultdict(int)
+        self._max_pending_per_chat = max_pending_per_chat
+        self._tasks: set[asyncio.Task] = set()
+
+    def spawn(self, chat_id: int, coro) -> bool:
+        """Запускает ход в фоне. False - у чата уже слишком много ходов в очереди."""
+        if self._pending[chat_id] >= self._max_pending_per_chat:
+            coro.close()
+            metrics.inc("bot_turns_rejected")
+            return False
+        self._pending[chat_id] += 1
+        task = asyncio.create_task(self._run(chat_id, coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, chat_id: int, coro):
+        try:
+            async with self._chat_locks[chat_id]:
+                async with self._global:
+                    await coro
+        except Exception:
+            logger.exception(f"Bot turn error (chat {chat_id})")
+            metrics.inc("bot_turn_errors")
+        finally:
+            coro.close()  # Если ход отменили до старта, корутина так и не запускалась
+            self._pending[chat_id] -= 1
+            if not self._pending[chat_id]:
+                del self._pending[chat_id]
+                self._chat_locks.pop(chat_id, None)
+
+    async def close(self):
+        """Отменяет незавершенные ходы (при остановке приложения)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+chat_pool = ChatTaskPool(
+    max_concurrency=settings.BOT_MAX_CONCURRENT_TURNS,
+    max_pending_per_chat=settings.BOT_MAX_PENDING_PER_CHAT,
+)
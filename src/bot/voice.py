@@ -0,0 +1,123 @@
+import asyncio
+import io
+import logging
+import time
+
+from aiogram.enums import ChatAction
+from aiogram.types import BufferedInputFile, Message
+
+from src.config import settings
+from src.schemas import TelegramUser
+from src.services.cache import state_store
+from src.services.diagnostics import blocking_site
+from src.services.interview import speech_to_text, generate_reply, synthesize_mp3, SILENCE_TEXT
+from src.services.metrics import metrics
+from src.services.scheduler import interview_scheduler, RateLimited, TurnSuperseded
+from src.services.transcripts import turn_recorder
+from src.services.users import user_registry
+
+logger = logging.getLogger(__name__)
+
+# --- Голосовое интервью прямо в боте ---
+# Тот же конвейер, что и у Mini App (STT -> RAG -> LLM -> TTS), но без временных файлов
+# и base64: голосовое скачивается в память как OGG/Opus, ответ уходит нативным voice.
+
+VOICE_CAPTION_LIMIT = 1024  # Лимит Telegram на подпись к голосовому
+
+# История диалога по чатам (в Mini App ее присылает клиент) хранится в state_store
+# (не в общем кэше, где ее вытесняла бы озвучка), namespace "bot_history",
+# последние BOT_HISTORY_TURNS реплик.
+
+
+def _ogg_to_wav(voice: io.BytesIO) -> io.BytesIO:
+    from pydub import AudioSegment
+
+    wav = io.BytesIO()
+    with blocking_site("bot_ogg_decode"):
+        AudioSegment.from_file(voice, format="ogg").export(wav, format="wav")
+    wav.seek(0)
+    return wav
+
+
+def _mp3_to_ogg_opus(mp3: bytes) -> bytes:
+    from pydub import AudioSegment
+
+    ogg = io.BytesIO()
+    with blocking_site("bot_opus_encode"):
+        AudioSegment.from_file(io.BytesIO(mp3), format="mp3").export(ogg, format="ogg", codec="libopus")
+    return ogg.getvalue()
+
+
+async def _voice_turn(message: Message, user: TelegramUser):
+    chat_id = message.chat.id
+    await message.bot.send_chat_action(chat_id, ChatAction.RECORD_VOICE)
+
+    # 1. STT (ffmpeg и распознавание - в потоках, чтобы не стопорить цикл)
+    started = time.perf_counter()
+    voice = await message.bot.download(message.voice)
+    wav = await asyncio.to_thread(_ogg_to_wav, voice)
+    user_text = await speech_to_text(wav)
+    stt_ms = int((time.perf_counter() - started) * 1000)
+
+    # 2. RAG + LLM
+    history = await state_store.get_json("bot_history", str(chat_id)) or []
+    ai_text, prompt, llm_ms = await generate_reply(user_text, history)
+
+    # 3. TTS -> OGG/Opus
+    tts_started = time.perf_counter()
+    mp3 = await synthesize_mp3(ai_text)
+    ogg = await asyncio.to_thread(_mp3_to_ogg_opus, mp3) if mp3 else b""
+    tts_ms = int((time.perf_counter() - tts_started) * 1000)
+
+    if ogg:
+        await message.answer_voice(
+            BufferedInputFile(ogg, filename="answer.ogg"),
+            caption=ai_text[:VOICE_CAPTION_LIMIT],
+        )
+    else:
+        await message.answer(ai_text)
+
+    if user_text and user_text != SILENCE_TEXT:
+        history.append({"role": "user", "content": user_text})
+    history.append({"role": "assistant", "content": ai_text})
+    await state_store.set_json("bot_history", str(chat_id), history[-settings.BOT_HISTORY_TURNS:])
+
+    turn_recorder.record(f"bot-{chat_id}", user.id, user_text, ai_text, {
+        "stt_ms": stt_ms,
+        "llm_ms": llm_ms,
+        "tts_ms": tts_ms,
+        "total_ms": int((time.perf_counter() - started) * 1000),
+        "prompt_tokens": prompt.total_tokens,
+    })
+
+
+async def run_voice_turn(message: Message):
+    """Ход голосового интервью. Идет через тот же планировщик, что и /interview/chat."""
+    from_user = message.from_user
+    user = TelegramUser(
+        id=from_user.id,
+        first_name=from_user.first_name,
+        last_name=from_user.last_name,
+        username=from_user.username,
+        language_code=from_user.language_code,
+        is_premium=from_user.is_premium,
+    )
+    user_registry.touch(user)
+
+    try:
+        weight = settings.INTERVIEW_PREMIUM_WEIGHT if await user_registry.is_premium(user.id) else 1.0
+        async with interview_scheduler.turn(user.id, weight, channel="bot"):
+            await _voice_turn(message, user)
+    except RateLimited:
+        await message.answer("Слишком часто. Подожди немного и пришли голосовое еще раз.")
+    except TurnSuperseded:
+        # Ходы одного чата идут по очереди через chat_pool, вытеснить может только
+        # более новое голосовое этого же пользователя в боте - ответ придет на него
+        pass
+    except Exception:
+        logger.exception(f"Voice turn failed (chat {message.chat.id})")
+        metrics.inc("bot_turn_errors")
+        try:
+            await message.answer("Что-то пошло не так при обработке голосового. Попробуй еще раз.")
+        except Exception:
+            logger.exception(f"Failed to send error reply (chat {message.chat.id})")
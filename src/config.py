@@ -10,10 +10,59 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str
     POSTGRES_PORT: int
+    DB_WARM_CONNECTIONS: int = 2  # Сколько соединений открыть заранее при старте
+    QUESTION_INDEX_TTL: float = 600.0  # Через сколько секунд индекс вопросов RAG перечитывается из БД
     
     # Заменили OpenAI на Groq
     OPENROUTER_API_KEY: str
 
+    # Бюджеты промпта в токенах (по секциям)
+    PROMPT_BUDGET_SYSTEM: int = 2000
+    PROMPT_BUDGET_RAG: int = 600
+    PROMPT_BUDGET_HISTORY: int = 3000
+    PROMPT_BUDGET_SUMMARY: int = 300   # Часть бюджета истории под сжатые старые реплики
+    PROMPT_BUDGET_USER: int = 800
+    PROMPT_IMAGE_TOKENS: int = 258     # Фиксированная стоимость одной картинки
+    PROMPT_ENCODING: str = "o200k_base"
+
+    # Планировщик /interview/chat
+    INTERVIEW_MAX_CONCURRENCY: int = 4      # Сколько ходов одновременно гоняем через STT/LLM/TTS
+    INTERVIEW_RATE_BURST: int = 3           # Размер token bucket на пользователя
+    INTERVIEW_RATE_PER_MINUTE: float = 6    # Скорость пополнения bucket
+    INTERVIEW_PREMIUM_WEIGHT: float = 2.0   # Вес премиум-пользователей в очереди
+
+    # Отложенная запись пользователей в БД
+    USER_FLUSH_INTERVAL: float = 5.0        # Раз в сколько секунд пишем пачку в users
+    USER_PREMIUM_CACHE_TTL: float = 300.0   # TTL кэша is_premium
+
+    # Запись ходов интервью (interview_turns)
+    TURNS_FLUSH_INTERVAL: float = 1.0       # Максимальная задержка записи пачки
+    TURNS_BATCH_SIZE: int = 200             # Ходов в одном INSERT
+    TURNS_QUEUE_SIZE: int = 10000           # При переполнении новые ходы отбрасываются
+
+    # Голосовое интервью в боте
+    # Polling Telegram допускается только в одном процессе на токен: в docker-compose
+    # его ведет отдельный сервис bot, а масштабируемые реплики app - с False
+    BOT_POLLING_ENABLED: bool = True
+    BOT_MAX_CONCURRENT_TURNS: int = 8       # Ходов в работе одновременно (на все чаты)
+    BOT_MAX_PENDING_PER_CHAT: int = 2       # Ходов одного чата (в работе + в очереди)
+    BOT_HISTORY_TURNS: int = 20             # Сколько реплик истории храним на чат
+
+    # Общий кэш (см. src/services/cache.py): memory:// или redis://host:port/db
+    CACHE_URL: str = "memory://"
+    CACHE_MAX_ITEMS: int = 10000            # Лимит ключей для memory:// (LRU)
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024 # Лимит объема значений для memory://
+
+    # Состояние диалогов (история чатов бота) - отдельно от кэша, чтобы его не вытесняла озвучка
+    STATE_URL: str = "memory://"
+    STATE_MAX_ITEMS: int = 50000            # Чатов с историей (LRU только среди историй)
+    STATE_MAX_BYTES: int = 128 * 1024 * 1024
+
+    # Диагностика event loop и /debug/profile (см. src/services/diagnostics.py)
+    DIAGNOSTICS_ENABLED: bool = False
+    DIAG_LAG_INTERVAL: float = 0.1          # Как часто меряем лаг цикла, сек
+    DIAG_SLOW_CALLBACK_MS: float = 100      # Зависание дольше - логируем стек
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
\ No newline at end of file
@@ -1,17 +1,29 @@
 import asyncio
+import hmac
 import logging
+import math
+import uuid
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Form, Header, Query
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware  # <--- NEW: Для связи с фронтом
 from aiogram import Bot, Dispatcher
 from aiogram.types import BotCommand
 
 from src.config import settings
 from src.bot.handlers import router as bot_router
+from src.bot.tasks import chat_pool
 from src.security import get_current_user
-from src.schemas import TelegramUser
-from src.services.interview import process_voice_interview
+from src.schemas import TelegramUser, InterviewTurnPage
+from src.services.interview import process_voice_interview, stop_question_index_refresh
+from src.services.cache import cache, state_store
+from src.services.diagnostics import loop_monitor, run_profile, ProfileBusy
+from src.services.metrics import metrics
+from src.services.scheduler import interview_scheduler, RateLimited, TurnSuperseded
+from src.services.users import user_registry
+from src.services.transcripts import turn_recorder, get_session_turns
+from src.services.warmup import warm_up, warmup_state
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -31,17 +43,43 @@ async def set_bot_commands(bot_instance: Bot):
 # --- FASTAPI LIFESPAN ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("Startup: Setting up bot...")
-    await set_bot_commands(bot)
-    polling_task = asyncio.create_task(dp.start_polling(bot))
+    if settings.DIAGNOSTICS_ENABLED:
+        logger.info("Startup: Event loop diagnostics enabled")
+        loop_monitor.start()
+    logger.info("Startup: Warming up...")
+    warmup_task = asyncio.create_task(warm_up())
+    polling_task = None
+    if settings.BOT_POLLING_ENABLED:
+        logger.info("Startup: Setting up bot...")
+        await set_bot_commands(bot)
+        # handle_as_tasks: каждый апдейт в своей задаче, долгие ходы уходят в chat_pool
+        polling_task = asyncio.create_task(dp.start_polling(bot, handle_as_tasks=True))
+    user_registry.start()
+    turn_recorder.start()
     yield
-    logger.info("Shutdown: Stopping bot...")
-    polling_task.cancel()
+    # Прогрев и перечитывание индекса вопросов ходят в БД - гасим их до остановки записи
+    warmup_task.cancel()
     try:
-        await polling_task
-    except asyncio.exceptions.CancelledError:
+        await warmup_task
+    except asyncio.CancelledError:
         pass
+    await stop_question_index_refresh()
+    if polling_task is not None:
+        logger.info("Shutdown: Stopping bot...")
+        polling_task.cancel()
+        try:
+            await polling_task
+        except asyncio.exceptions.CancelledError:
+            pass
+    await chat_pool.close()
+    logger.info("Shutdown: Flushing users and interview turns...")
+    await user_registry.stop()
+    await turn_recorder.stop()
+    await cache.close()
+    await state_store.close()
     await bot.session.close()
+    if settings.DIAGNOSTICS_ENABLED:
+        await loop_monitor.stop()
 
 # --- FASTAPI SETUP ---
 app = FastAPI(title="TWA Killer Core API", lifespan=lifespan)
@@ -62,6 +100,35 @@ app.add_middleware(
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Готовность к трафику: 503, пока не закончился прогрев."""
+    status_code = 200 if warmup_state.ready else 503
+    return JSONResponse(status_code=status_code, content=warmup_state.as_dict())
+
+@app.get("/metrics")
+async def get_metrics():
+    return {**metrics.snapshot(), "scheduler": interview_scheduler.stats()}
+
+@app.get("/debug/profile")
+async def debug_profile(
+    seconds: float = Query(5, gt=0, le=60),
+    x_debug_token: str = Header(""),
+):
+    """
+    Семплирующий CPU-профиль потока event loop за N секунд (только с DIAGNOSTICS_ENABLED).
+    Только для админа: заголовок X-Debug-Token должен совпадать с SECRET_KEY.
+    """
+    if not settings.DIAGNOSTICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_debug_token.encode(), settings.SECRET_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        # Эндпоинт выполняется в потоке цикла - его и профилируем
+        return await run_profile(seconds)
+    except ProfileBusy:
+        raise HTTPException(status_code=409, detail="Profile is already running")
+
 @app.get("/bot_status")
 async def bot_status():
     me = await bot.get_me()
@@ -105,15 +172,50 @@ async def upload_resume(
 async def interview_chat(
     file: UploadFile = File(...),
     image: UploadFile = File(None), # <--- Новое поле (необязательное)
-    history: str = Form("[]")
+    history: str = Form("[]"),
+    session_id: str | None = Form(None, max_length=64),
+    user: TelegramUser = Depends(get_current_user)
 ):
     """
     Принимает голос + историю + (опционально) картинку.
+    Ход проходит через планировщик: лимит частоты, один ход пользователя в Mini App, честная очередь.
     """
     try:
-        # Передаем image в сервис
-        result = await process_voice_interview(file, history, image)
+        weight = settings.INTERVIEW_PREMIUM_WEIGHT if await user_registry.is_premium(user.id) else 1.0
+        async with interview_scheduler.turn(user.id, weight, channel="http"):
+            # Передаем image в сервис
+            result = await process_voice_interview(file, history, image)
+
+        # Сохраняем ход (в фоне, пачками) и отдаем клиенту ID сессии для продолжения
+        session_id = session_id or uuid.uuid4().hex
+        timings = result.pop("timings", None)
+        if timings is not None:
+            turn_recorder.record(session_id, user.id, result["user_text"], result["ai_text"], timings)
+        result["session_id"] = session_id
         return result
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    except TurnSuperseded:
+        raise HTTPException(status_code=409, detail="Superseded by a newer request")
     except Exception as e:
         logger.error(f"Interview error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/interview/sessions/{session_id}/turns", response_model=InterviewTurnPage)
+async def interview_session_turns(
+    session_id: str,
+    after_id: int = Query(0, ge=0, description="Курсор: id последнего хода с прошлой страницы"),
+    limit: int = Query(20, ge=1, le=100),
+    user: TelegramUser = Depends(get_current_user)
+):
+    """
+    История ходов сессии для восстановления интервью после перезагрузки.
+    Ходы пишутся в БД с задержкой до TURNS_FLUSH_INTERVAL секунд.
+    """
+    turns, next_after_id = await get_session_turns(session_id, user.id, after_id, limit)
+    return InterviewTurnPage(turns=turns, next_after_id=next_after_id)
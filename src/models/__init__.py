@@ -1,3 +1,4 @@
 from src.models.user import User
 from src.models.question import Question
+from src.models.interview_turn import InterviewTurn
 # В будущем сюда добавим Resume, Interview и т.д.
\ No newline at end of file
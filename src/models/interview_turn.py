@@ -0,0 +1,38 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Integer, String, Text, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from src.database import Base
+
+class InterviewTurn(Base):
+    __tablename__ = "interview_turns"
+
+    # BigInteger: id растет монотонно и служит курсором для keyset-пагинации
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+
+    # ID сессии интервью (генерируется при первом ходе, клиент присылает его дальше)
+    session_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    user_text: Mapped[str] = mapped_column(Text, nullable=False)
+    ai_text: Mapped[str] = mapped_column(Text, nullable=False)
+
+    # Тайминги этапов в миллисекундах
+    stt_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    llm_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    tts_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    total_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    prompt_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Индекс под WHERE session_id = ? AND user_id = ? AND id > ? ORDER BY id LIMIT n:
+        # оба равенства и диапазон по id - ключевые колонки, поэтому Postgres сразу
+        # встает на первую строку страницы и читает ровно limit+1 записей в нужном порядке
+        Index("ix_interview_turns_session_user_id", "session_id", "user_id", "id"),
+    )
+
+    def __repr__(self):
+        return f"<InterviewTurn(id={self.id}, session_id={self.session_id})>"
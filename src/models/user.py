@@ -21,6 +21,8 @@ class User(Base):
     # Время создания и обновления
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+    # Последняя активность (пишется пачками из UserRegistry)
+    last_seen_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     def __repr__(self):
         return f"<User(id={self.id}, username={self.username})>"
\ No newline at end of file
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
 
 # Модель пользователя внутри initData (Telegram присылает JSON внутри строки)
 class TelegramUser(BaseModel):
@@ -12,4 +13,22 @@ class TelegramUser(BaseModel):
 
 # Модель данных авторизации, которые мы ждем от фронтенда
 class TelegramAuthData(BaseModel):
-    initData: str = Field(..., description="Raw query string from Telegram WebApp")
\ No newline at end of file
+    initData: str = Field(..., description="Raw query string from Telegram WebApp")
+
+# Один ход интервью из истории сессии
+class InterviewTurnOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_text: str
+    ai_text: str
+    stt_ms: int | None = None
+    llm_ms: int | None = None
+    tts_ms: int | None = None
+    total_ms: int | None = None
+    created_at: datetime
+
+# Страница ходов: next_after_id передается обратно как after_id (None - страниц больше нет)
+class InterviewTurnPage(BaseModel):
+    turns: list[InterviewTurnOut]
+    next_after_id: int | None = None
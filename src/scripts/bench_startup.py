@@ -0,0 +1,93 @@
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Бенчмарк холодного старта.
+# Запуск из корня проекта: python -m src.scripts.bench_startup
+#   1. Время импорта src.main в чистом процессе (и какие тяжелые модули подтянулись).
+#   2. Сколько стоил бы первый запрос без прогрева (ленивый импорт медиа-стека).
+#   3. Длительность прогрева по шагам и латентность первого/второго HTTP-запроса.
+
+RUNS = 5
+
+IMPORT_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import src.main
+elapsed = (time.perf_counter() - started) * 1000
+from src.services.interview import HEAVY_MODULES
+print(json.dumps({"ms": elapsed, "heavy_loaded": [m for m in HEAVY_MODULES if m in sys.modules]}))
+"""
+
+LAZY_IMPORT_SNIPPET = """
+import importlib, json, time
+import src.main
+from src.services.interview import HEAVY_MODULES
+result = {}
+for name in HEAVY_MODULES:
+    started = time.perf_counter()
+    importlib.import_module(name)
+    result[name] = (time.perf_counter() - started) * 1000
+print(json.dumps(result))
+"""
+
+
+def run_snippet(snippet: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", snippet],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    # Последняя строка - наш JSON (до нее могут быть DEBUG-принты)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_import():
+    runs = [run_snippet(IMPORT_SNIPPET) for _ in range(RUNS)]
+    times = [r["ms"] for r in runs]
+    print(f"import src.main: median {statistics.median(times):.0f} ms, "
+          f"min {min(times):.0f} ms, max {max(times):.0f} ms ({RUNS} runs)")
+    print(f"  heavy modules loaded at import: {runs[0]['heavy_loaded'] or 'none'}")
+
+
+def bench_lazy_imports():
+    result = run_snippet(LAZY_IMPORT_SNIPPET)
+    total = sum(result.values())
+    print(f"first-request import cost without warm-up: {total:.0f} ms")
+    for name, ms in result.items():
+        print(f"  {name}: {ms:.0f} ms")
+
+
+async def bench_first_request():
+    import httpx
+    from src.main import app
+    from src.services.warmup import warm_up, warmup_state
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/health", "/ready"):
+            started = time.perf_counter()
+            response = await client.get(path)
+            first = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            await client.get(path)
+            second = (time.perf_counter() - started) * 1000
+            print(f"GET {path} -> {response.status_code}: first {first:.1f} ms, second {second:.1f} ms")
+
+        started = time.perf_counter()
+        await warm_up(retry_critical=False)  # Без фоновых повторов: меряем один проход
+        print(f"warm-up: {(time.perf_counter() - started) * 1000:.0f} ms total")
+        for name, ms in warmup_state.steps.items():
+            error = warmup_state.errors.get(name)
+            print(f"  {name}: {ms:.0f} ms" + (f" (failed: {error})" if error else ""))
+
+        response = await client.get("/ready")
+        print(f"GET /ready after warm-up -> {response.status_code}")
+
+
+if __name__ == "__main__":
+    bench_import()
+    bench_lazy_imports()
+    asyncio.run(bench_first_request())
@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import resource
+import time
+from urllib.parse import urlencode
+
+# Нагрузочный и soak-тест всего API (src.main:app) в одном процессе.
+# Запуск из корня проекта:
+#   python -m src.scripts.load_test --stages 1,5,10,25 --stage-seconds 20 --soak-seconds 300
+#
+# Синтетические пользователи Mini App шлют /interview/chat (голос + иногда картинка +
+# растущая история) с валидной подписью initData. Внешние сервисы (ffmpeg, Google STT,
+# LLM, Edge TTS, Postgres) заменены локальными заглушками с задержками, поэтому
+# измеряется именно наш код: планировщик, сборка промпта, кэш, временные файлы.
+# Отчет: пропускная способность, латентность p50/p95/p99, лаг event loop,
+# рост RSS, утечки файловых дескрипторов и временных файлов.
+
+# Лимиты частоты рассчитаны на людей, а не на генератор нагрузки.
+# Выставляем до импорта src, т.к. настройки читаются из окружения.
+os.environ.setdefault("INTERVIEW_RATE_BURST", "1000000")
+os.environ.setdefault("INTERVIEW_RATE_PER_MINUTE", "1000000")
+
+from src.config import settings  # noqa: E402
+
+STT_DELAY = 0.15
+LLM_DELAY = 0.40
+TTS_DELAY = 0.20
+FFMPEG_DELAY = 0.02
+IMAGE_SHARE = 0.2
+HISTORY_LIMIT = 10  # Столько реплик истории шлет фронтенд
+
+AI_PHRASES = [
+    "Привет. Времени мало, давай сразу к делу. На какую позицию претендуешь?",
+    "Хорошо. Расскажи, чем отличается лист от тьюпла в пайтоне.",
+    "Слабо. Что такое индекс в базе данных и когда он не помогает?",
+    "Допустим. Как бы ты спроектировал очередь задач под нагрузкой?",
+]
+
+
+# --- Подпись initData (как это делает Telegram) ---
+def sign_init_data(user_id: int, bot_token: str) -> str:
+    data = {
+        "auth_date": str(int(time.time())),
+        "query_id": f"AAF{user_id}",
+        "user": json.dumps({"id": user_id, "first_name": f"Load{user_id}", "username": f"load_{user_id}"}),
+    }
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    data["hash"] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(data)
+
+
+# --- Заглушки внешних сервисов ---
+class _StubSegment:
+    @classmethod
+    def from_file(cls, path, format=None):
+        time.sleep(FFMPEG_DELAY)  # ffmpeg - отдельный процесс, но вызов синхронный
+        return cls()
+
+    def export(self, out, format=None, codec=None):
+        data = b"RIFF" + os.urandom(2048)
+        if isinstance(out, (str, os.PathLike)):
+            with open(out, "wb") as f:
+                f.write(data)
+        else:
+            out.write(data)
+
+
+class _StubCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        await asyncio.sleep(LLM_DELAY)
+        self.calls += 1
+        # Номер вызова делает ответы уникальными: иначе озвучка после первых фраз
+        # берется из кэша tts и TTS_DELAY выпадает из замеров
+        text = f"{AI_PHRASES[self.calls % len(AI_PHRASES)]} (вопрос {self.calls})"
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 3 for m in messages)
+        message = type("Msg", (), {"content": text})
+        usage = type("Usage", (), {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 3})
+        return type("Resp", (), {"choices": [type("Choice", (), {"message": message})], "usage": usage})
+
+
+class _StubClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": _StubCompletions()})
+
+
+def install_stubs():
+    import pydub
+    from src.services import interview
+    from src.services.transcripts import turn_recorder
+    from src.services.users import user_registry
+
+    async def fake_speech_to_text(wav_source):
+        await asyncio.sleep(STT_DELAY)
+        return random.choice(["Я пайтон разработчик, три года опыта", "Не знаю", "Расскажи о себе"])
+
+    async def fake_tts(speech_text):
+        await asyncio.sleep(TTS_DELAY)
+        return os.urandom(16 * 1024)
+
+    async def fake_is_premium(user_id):
+        return user_id % 10 == 0
+
+    async def fake_flush():
+        user_registry._dirty.clear()
+        return 0
+
+    async def fake_write(rows):
+        pass
+
+    async def fake_load_question_index():
+        return sum(len(v) for v in interview.QUESTION_INDEX.values())
+
+    client = _StubClient()
+    pydub.AudioSegment = _StubSegment
+    interview.speech_to_text = fake_speech_to_text
+    interview._edge_tts_mp3 = fake_tts
+    interview.get_client = lambda: client
+    interview.QUESTION_INDEX = {
+        category: [f"Вопрос {category} {i}" for i in range(50)]
+        for category in ("general", "python", "frontend", "sql", "hr")
+    }
+    interview.load_question_index = fake_load_question_index
+    user_registry.is_premium = fake_is_premium
+    user_registry.flush = fake_flush
+    turn_recorder._write = fake_write
+
+
+# --- Процессные метрики ---
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def temp_files() -> int:
+    from src.services.interview import TEMP_DIR
+    return len(list(TEMP_DIR.glob("*"))) if TEMP_DIR.exists() else 0
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append((loop.time() - started - self.interval) * 1000)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def reset(self) -> list[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+# --- Виртуальный пользователь ---
+class StageStats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.statuses: dict[int, int] = {}
+
+    def add(self, status: int, latency_ms: float):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 200:
+            self.latencies.append(latency_ms)
+
+
+async def virtual_user(client, user_id: int, stop_at: float, stats: StageStats, think_time: float):
+    headers = {"Authorization": f"twa-init-data {sign_init_data(user_id, settings.BOT_TOKEN)}"}
+    history: list[dict] = []
+    session_id = None
+    while time.monotonic() < stop_at:
+        files = {"file": ("voice.webm", os.urandom(8 * 1024), "audio/webm")}
+        if random.random() < IMAGE_SHARE:
+            files["image"] = ("photo.png", os.urandom(32 * 1024), "image/png")
+        data = {"history": json.dumps(history[-HISTORY_LIMIT:])}
+        if session_id:
+            data["session_id"] = session_id
+
+        started = time.perf_counter()
+        response = await client.post("/interview/chat", headers=headers, files=files, data=data)
+        stats.add(response.status_code, (time.perf_counter() - started) * 1000)
+
+        if response.status_code == 200:
+            body = response.json()
+            session_id = body.get("session_id")
+            history.append({"role": "user", "content": body["user_text"]})
+            history.append({"role": "assistant", "content": body["ai_text"]})
+        await asyncio.sleep(random.uniform(0, think_time))
+
+
+def pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def report_stage(name: str, stats: StageStats, lag: list[float], seconds: float):
+    ok = len(stats.latencies)
+    print(
+        f"{name:>14} | {ok / seconds:7.1f} req/s | "
+        f"p50 {pct(stats.latencies, .5):7.0f} p95 {pct(stats.latencies, .95):7.0f} "
+        f"p99 {pct(stats.latencies, .99):7.0f} ms | "
+        f"loop lag p99 {pct(lag, .99):6.1f} max {max(lag, default=0):6.1f} ms | "
+        f"statuses {stats.statuses}"
+    )
+
+
+async def run_phase(client, name, concurrency, seconds, lag_monitor, think_time):
+    stats = StageStats()
+    stop_at = time.monotonic() + seconds
+    lag_monitor.reset()
+    users = [
+        asyncio.create_task(virtual_user(client, 100000 + i, stop_at, stats, think_time))
+        for i in range(concurrency)
+    ]
+    await asyncio.gather(*users)
+    report_stage(name, stats, lag_monitor.reset(), seconds)
+    return stats
+
+
+async def main(args):
+    import httpx
+
+    install_stubs()
+    from src.main import app
+    from src.services.metrics import metrics
+    from src.services.transcripts import turn_recorder
+    from src.services.users import user_registry
+
+    # Lifespan не запускаем (там polling бота), фоновые компоненты стартуем сами
+    user_registry.start()
+    turn_recorder.start()
+    lag_monitor = LoopLagMonitor()
+    lag_monitor.start()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+        print(f"Ramp: stages {args.stages}, {args.stage_seconds}s each "
+              f"(INTERVIEW_MAX_CONCURRENCY={settings.INTERVIEW_MAX_CONCURRENCY})")
+        for concurrency in args.stages:
+            await run_phase(client, f"{concurrency} users", concurrency, args.stage_seconds, lag_monitor, args.think_time)
+
+        if args.soak_seconds:
+            concurrency = args.stages[-1]
+            print(f"\nSoak: {concurrency} users for {args.soak_seconds}s")
+            baseline = (rss_mb(), open_fds(), temp_files())
+            print(f"  start: RSS {baseline[0]:.1f} MB, fds {baseline[1]}, temp files {baseline[2]}")
+            elapsed = 0
+            while elapsed < args.soak_seconds:
+                window = min(args.soak_window, args.soak_seconds - elapsed)
+                await run_phase(client, f"soak +{elapsed + window}s", concurrency, window, lag_monitor,
+                                args.think_time)
+                elapsed += window
+                print(f"  RSS {rss_mb():.1f} MB, fds {open_fds()}, temp files {temp_files()}")
+
+            await asyncio.sleep(0.5)  # Даем закрыться хвостам
+            final = (rss_mb(), open_fds(), temp_files())
+            print(f"  end:   RSS {final[0]:.1f} MB (+{final[0] - baseline[0]:.1f}), "
+                  f"fds {final[1]} ({final[1] - baseline[1]:+d}), temp files {final[2]} ({final[2] - baseline[2]:+d})")
+            if final[2] > baseline[2] or final[1] > baseline[1] + 5:
+                print("  WARNING: possible temp-file / fd leak")
+
+    await lag_monitor.stop()
+    await turn_recorder.stop()
+    await user_registry.stop()
+
+    histograms = metrics.snapshot()["histograms"]
+    for name in ("interview_queue_wait_ms", "prompt_tokens_estimated"):
+        if name in histograms:
+            print(f"{name}: {histograms[name]}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load/soak test for src.main:app with stubbed externals")
+    parser.add_argument("--stages", default="1,5,10,25",
+                        type=lambda s: [int(x) for x in s.split(",")], help="Concurrency ramp")
+    parser.add_argument("--stage-seconds", type=float, default=15)
+    parser.add_argument("--soak-seconds", type=int, default=0, help="0 - skip soak")
+    parser.add_argument("--soak-window", type=int, default=30, help="Reporting window during soak")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Max pause between turns of a user")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
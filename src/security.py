@@ -9,6 +9,7 @@ from pydantic import ValidationError
 
 from src.config import settings
 from src.schemas import TelegramUser
+from src.services.users import user_registry
 
 # Время жизни данных валидации (например, 1 день). 
 # Чтобы старые перехваченные данные нельзя было использовать вечно.
@@ -90,4 +91,7 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Invalid header format")
     
     init_data_raw = authorization.split(" ", 1)[1]
-    return validate_telegram_data(init_data_raw)
\ No newline at end of file
+    user = validate_telegram_data(init_data_raw)
+    # Запись в БД отложенная и пачками, тут только отметка в памяти
+    user_registry.touch(user)
+    return user
\ No newline at end of file
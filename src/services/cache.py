@@ -0,0 +1,297 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from src.config import settings
+from src.services.metrics import metrics
+
+# --- Общий кэш / состояние ---
+# Всё горячее (премиум-флаги, озвучка, истории чатов бота) кладется сюда, а не в
+# словари модулей: с Redis кэш общий для всех реплик app, без Redis - в памяти процесса.
+#   CACHE_URL=memory://            - в памяти процесса (по умолчанию)
+#   CACHE_URL=redis://redis:6379/0 - Redis (нужен пакет redis)
+#   CACHE_URL=fakeredis://         - Redis-протокол поверх FakeRedis (для тестов)
+#
+# У каждого namespace свой TTL по умолчанию. get_or_set схлопывает одновременные
+# промахи по одному ключу в один вызов factory (single-flight), а в Redis еще и
+# между репликами (через lock-ключ SET NX).
+# Состояние диалогов (история чатов бота) лежит не здесь, а в state_store с отдельными
+# лимитами: иначе тяжелые MP3 из "tts" вытесняли бы истории посреди интервью.
+#
+# Недоступный Redis не роняет запросы: чтение считается промахом, запись пропускается,
+# а заполнение идет напрямую через factory.
+
+DEFAULT_TTL = 300.0
+NAMESPACE_TTLS = {
+    "premium": settings.USER_PREMIUM_CACHE_TTL,
+    "tts": 7 * 86400.0,
+    "bot_history": 86400.0,
+}
+
+LOCK_TTL_MS = 30000     # Сколько живет lock на заполнение ключа в Redis
+LOCK_POLL_SECONDS = 0.05
+
+
+def namespace_ttl(namespace: str, ttl: float | None = None) -> float:
+    return ttl if ttl is not None else NAMESPACE_TTLS.get(namespace, DEFAULT_TTL)
+
+
+class CacheBackend(ABC):
+    """Базовый класс: хранит bytes по (namespace, key). Наследники реализуют get/set/delete."""
+
+    def __init__(self):
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: bytes, ttl: float | None = None):
+        ...
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str):
+        ...
+
+    async def close(self):
+        pass
+
+    async def _fill(self, namespace: str, key: str, factory: Callable[[], Awaitable[bytes]], ttl):
+        value = await factory()
+        await self.set(namespace, key, value, ttl)
+        return value
+
+    async def get_or_set(
+        self,
+        namespace: str,
+        key: str,
+        factory: Callable[[], Awaitable[bytes]],
+        ttl: float | None = None,
+    ) -> bytes:
+        value = await self.get(namespace, key)
+        if value is not None:
+            metrics.inc(f"cache_{namespace}_hit")
+            return value
+
+        flight_key = (namespace, key)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            metrics.inc(f"cache_{namespace}_miss")
+            # Заполнение - отдельная задача: отмена одного из ждущих не ломает остальных
+            task = asyncio.ensure_future(self._fill(namespace, key, factory, ttl))
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda t: self._on_fill_done(flight_key, t))
+        else:
+            metrics.inc(f"cache_{namespace}_coalesced")
+        return await asyncio.shield(task)
+
+    def _on_fill_done(self, flight_key, task: asyncio.Task):
+        self._inflight.pop(flight_key, None)
+        # Забираем исключение, даже если все ждущие уже отменены (иначе warning в логах)
+        if not task.cancelled():
+            task.exception()
+
+    # --- JSON-обертки ---
+    async def get_json(self, namespace: str, key: str):
+        value = await self.get(namespace, key)
+        return json.loads(value) if value is not None else None
+
+    async def set_json(self, namespace: str, key: str, value, ttl: float | None = None):
+        await self.set(namespace, key, json.dumps(value).encode(), ttl)
+
+    async def get_or_set_json(self, namespace: str, key: str, factory, ttl: float | None = None):
+        async def encoded():
+            return json.dumps(await factory()).encode()
+        return json.loads(await self.get_or_set(namespace, key, encoded, ttl))
+
+
+class InMemoryBackend(CacheBackend):
+    """Кэш в памяти процесса (LRU + TTL). Истекшие ключи удаляются при обращении."""
+
+    def __init__(self, max_items: int, max_bytes: int):
+        super().__init__()
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._data: "OrderedDict[tuple[str, str], tuple[bytes, float]]" = OrderedDict()
+
+    async def get(self, namespace, key):
+        item = self._data.get((namespace, key))
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            self._remove((namespace, key))
+            return None
+        self._data.move_to_end((namespace, key))
+        return value
+
+    def _remove(self, data_key):
+        item = self._data.pop(data_key, None)
+        if item is not None:
+            self._size -= len(item[0])
+
+    async def set(self, namespace, key, value, ttl=None):
+        self._remove((namespace, key))
+        self._data[(namespace, key)] = (value, time.monotonic() + namespace_ttl(namespace, ttl))
+        self._size += len(value)
+        # Вытесняем самые давно использованные ключи (озвучка бывает тяжелой)
+        while self._data and (len(self._data) > self._max_items or self._size > self._max_bytes):
+            _, (old_value, _) = self._data.popitem(last=False)
+            self._size -= len(old_value)
+
+    async def delete(self, namespace, key):
+        self._remove((namespace, key))
+
+
+def _redis_error_types() -> tuple:
+    # Пакет redis нужен только для redis://, с FakeRedis его может не быть
+    try:
+        from redis.exceptions import RedisError
+    except ImportError:
+        return (OSError,)
+    return (RedisError, OSError)
+
+
+class RedisBackend(CacheBackend):
+    """Кэш в Redis (или в FakeRedis). Ключи: <prefix>:<namespace>:<key>."""
+
+    def __init__(self, client, prefix: str = "twa"):
+        super().__init__()
+        self._redis = client
+        self._prefix = prefix
+        self._errors = _redis_error_types()
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self._prefix}:{namespace}:{key}"
+
+    def _failed(self, op: str, e: Exception):
+        metrics.inc(f"cache_redis_{op}_errors")
+        print(f"Redis cache {op} error: {e}")
+
+    async def get(self, namespace, key):
+        try:
+            return await self._redis.get(self._key(namespace, key))
+        except self._errors as e:
+            self._failed("get", e)
+            return None
+
+    async def set(self, namespace, key, value, ttl=None):
+        ttl_ms = max(1, int(namespace_ttl(namespace, ttl) * 1000))
+        try:
+            await self._redis.set(self._key(namespace, key), value, px=ttl_ms)
+        except self._errors as e:
+            self._failed("set", e)
+
+    async def delete(self, namespace, key):
+        try:
+            await self._redis.delete(self._key(namespace, key))
+        except self._errors as e:
+            self._failed("delete", e)
+
+    async def close(self):
+        try:
+            await self._redis.aclose()
+        except self._errors as e:
+            self._failed("close", e)
+
+    async def _fill(self, namespace, key, factory, ttl):
+        lock_key = self._key(namespace, key) + ":lock"
+        try:
+            locked = await self._redis.set(lock_key, b"1", nx=True, px=LOCK_TTL_MS)
+        except self._errors as e:
+            # Без lock'а просто заполняем сами (single-flight внутри процесса остается)
+            self._failed("lock", e)
+            return await super()._fill(namespace, key, factory, ttl)
+
+        if locked:
+            try:
+                return await super()._fill(namespace, key, factory, ttl)
+            finally:
+                try:
+                    await self._redis.delete(lock_key)
+                except self._errors as e:
+                    self._failed("unlock", e)  # Lock истечет сам через LOCK_TTL_MS
+
+        # Ключ уже заполняет другая реплика - ждем результат, но не дольше lock'а
+        metrics.inc(f"cache_{namespace}_coalesced_remote")
+        deadline = time.monotonic() + LOCK_TTL_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            try:
+                value = await self._redis.get(self._key(namespace, key))
+            except self._errors as e:
+                self._failed("get", e)
+                break
+            if value is not None:
+                return value
+        return await super()._fill(namespace, key, factory, ttl)
+
+
+class FakeRedis:
+    """
+    Минимальная замена redis.asyncio.Redis в памяти (get/set с px/ex/nx, delete).
+    Для тестов RedisBackend без живого Redis.
+    """
+
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, float | None]] = {}
+
+    def _alive(self, name: str):
+        item = self._data.get(name)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return item
+
+    async def get(self, name: str):
+        item = self._alive(name)
+        return item[0] if item is not None else None
+
+    async def set(self, name: str, value, ex: float | None = None, px: int | None = None, nx: bool = False):
+        if nx and self._alive(name) is not None:
+            return None
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = None
+        if px is not None:
+            expires_at = time.monotonic() + px / 1000
+        elif ex is not None:
+            expires_at = time.monotonic() + ex
+        self._data[name] = (value, expires_at)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    async def aclose(self):
+        pass
+
+
+def create_cache_backend(
+    url: str,
+    max_items: int = settings.CACHE_MAX_ITEMS,
+    max_bytes: int = settings.CACHE_MAX_BYTES,
+) -> CacheBackend:
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        import redis.asyncio as redis
+        return RedisBackend(redis.from_url(url))
+    if url.startswith("fakeredis://"):
+        return RedisBackend(FakeRedis())
+    if url.startswith("memory://"):
+        return InMemoryBackend(max_items=max_items, max_bytes=max_bytes)
+    raise ValueError(f"Unsupported cache URL: {url}")
+
+
+cache = create_cache_backend(settings.CACHE_URL)
+
+# Для redis:// нужен отдельный инстанс без allkeys-lru (в общем Redis его вытеснит кэш)
+state_store = create_cache_backend(
+    settings.STATE_URL,
+    max_items=settings.STATE_MAX_ITEMS,
+    max_bytes=settings.STATE_MAX_BYTES,
+)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from src.config import settings
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- Диагностика event loop (включается DIAGNOSTICS_ENABLED) ---
+# В одном цикле крутятся FastAPI и polling бота, поэтому любой синхронный вызов
+# (запись файла, ffmpeg через pydub, распознавание) тормозит всех. Здесь:
+#   * LoopMonitor - замер лага цикла + сторожевой поток, который при зависании
+#     дольше DIAG_SLOW_CALLBACK_MS логирует стек того, что сейчас занимает цикл;
+#   * blocking_site() - счетчики и тайминги по известным блокирующим местам;
+#   * sample_profile() - семплирующий CPU-профайлер для /debug/profile.
+
+PROFILE_STACK_DEPTH = 30
+PROFILE_TOP = 20
+
+# Какое блокирующее место сейчас выполняется в потоке цикла (для отчета о зависании)
+_loop_thread_id: int | None = None
+_active_site: str | None = None
+
+# Профиль снимается в отдельном потоке (не в общем executor'е, который заняли бы
+# STT и ffmpeg), и только один за раз
+_profile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profiler")
+_profile_lock = asyncio.Lock()
+
+
+class ProfileBusy(Exception):
+    """Профиль уже снимается."""
+
+
+@contextmanager
+def blocking_site(name: str):
+    """
+    Обертка вокруг заведомо синхронного кода:
+        with blocking_site("ffmpeg_decode"):
+            AudioSegment.from_file(...)
+    Счетчики пишутся всегда (это дешево), и в потоках тоже.
+    """
+    global _active_site
+    on_loop = threading.get_ident() == _loop_thread_id
+    if on_loop:
+        previous, _active_site = _active_site, name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if on_loop:
+            _active_site = previous
+            metrics.observe(f"blocking_{name}_loop_ms", elapsed_ms)
+        metrics.inc(f"blocking_{name}_calls")
+        metrics.observe(f"blocking_{name}_ms", elapsed_ms)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float, slow_callback_ms: float):
+        self._interval = interval
+        self._threshold = slow_callback_ms / 1000
+        self._beat = time.monotonic()
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    async def _sample_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self._interval)
+            metrics.observe("event_loop_lag_ms", (loop.time() - started - self._interval) * 1000)
+            self._beat = time.monotonic()
+
+    def _watchdog(self):
+        reported_beat = None
+        while not self._stop.wait(self._threshold / 2):
+            beat = self._beat
+            # Пульс должен приходить раз в interval, всё сверх - время, пока цикл занят
+            stalled = time.monotonic() - beat - self._interval
+            if stalled < self._threshold or beat == reported_beat:
+                continue
+            reported_beat = beat  # Одно зависание - один отчет
+
+            frame = sys._current_frames().get(_loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=PROFILE_STACK_DEPTH)) if frame else "<no frame>\n"
+            site = _active_site
+            metrics.inc("event_loop_stalls")
+            if site:
+                metrics.inc(f"blocking_{site}_stalls")
+            logger.warning(
+                f"Event loop blocked for {stalled * 1000:.0f}+ ms (site: {site or 'unknown'}):\n{stack}"
+            )
+
+    def start(self):
+        global _loop_thread_id
+        _loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample_lag())
+        self._thread = threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+
+def sample_profile(thread_id: int, seconds: float, interval: float = 0.005) -> dict:
+    """
+    Семплирующий профайлер: раз в interval снимает стек потока thread_id.
+    Блокирующий, вызывать через asyncio.to_thread. Время в select() - простой цикла.
+    """
+    stacks: Counter = Counter()
+    functions: Counter = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            entries = [
+                f"{f.filename}:{f.name}:{f.lineno}"
+                for f in traceback.extract_stack(frame, limit=PROFILE_STACK_DEPTH)
+            ]
+            stacks[";".join(entries)] += 1
+            functions[entries[-1]] += 1
+            samples += 1
+        time.sleep(interval)
+
+    def top(counter: Counter, field: str) -> list:
+        return [
+            {field: key, "samples": count, "pct": round(100 * count / samples, 1)}
+            for key, count in counter.most_common(PROFILE_TOP)
+        ]
+
+    return {
+        "seconds": seconds,
+        "interval_ms": interval * 1000,
+        "samples": samples,
+        "top_functions": top(functions, "frame") if samples else [],
+        "top_stacks": top(stacks, "stack") if samples else [],
+    }
+
+
+async def run_profile(seconds: float) -> dict:
+    """Профилирует поток текущего event loop. ProfileBusy - если профиль уже снимается."""
+    if _profile_lock.locked():
+        raise ProfileBusy()
+    async with _profile_lock:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_profile_executor, sample_profile, threading.get_ident(), seconds)
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.DIAG_LAG_INTERVAL,
+    slow_callback_ms=settings.DIAG_SLOW_CALLBACK_MS,
+)
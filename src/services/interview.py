@@ -1,43 +1,100 @@
 import os
 import base64
+import hashlib
 import uuid
 import json
 import asyncio
 import re
 import random
+import time
+from functools import lru_cache
 from typing import List, Optional
 from pathlib import Path
 from fastapi import UploadFile
-from openai import AsyncOpenAI
-import speech_recognition as sr
-from pydub import AudioSegment
-import edge_tts 
 from sqlalchemy import select, func
 
 from src.config import settings
 from src.database import AsyncSessionLocal
 from src.models.question import Question
+from src.services.cache import cache
+from src.services.diagnostics import blocking_site
+from src.services.prompt_builder import build_prompt, ensure_encoding, record_prompt_metrics
 
 # --- НАСТРОЙКИ (Адаптировано под VseGPT) ---
 # Вставь точный ID модели с VseGPT (например, google/gemini-2.5-flash-lite)
 MODEL_NAME = "google/gemini-2.5-flash-lite" 
 VOICE_NAME = "ru-RU-DmitryNeural" # Строгий мужской голос
 
-# Клиент VseGPT
-client = AsyncOpenAI(
-    api_key=settings.OPENROUTER_API_KEY, # Используем старое имя переменной, но ключ VseGPT
-    base_url="OPENROUTER_API_KEY"
-)
+# Тяжелые библиотеки (openai, speech_recognition, pydub, edge_tts) импортируются лениво:
+# импорт src.main остается быстрым, а прогрев в lifespan (src/services/warmup.py)
+# подгружает их в фоне до первого запроса.
+HEAVY_MODULES = ("openai", "speech_recognition", "pydub", "edge_tts")
 
 TEMP_DIR = Path("temp_audio")
-TEMP_DIR.mkdir(exist_ok=True)
 PROMPT_PATH = Path("src/prompts/interview_master.txt")
 
+# Индекс вопросов для RAG: категория -> тексты. Заполняется при прогреве,
+# до этого get_rag_context ходит в БД. Старше QUESTION_INDEX_TTL - перечитывается в фоне,
+# чтобы новые вопросы из БД попадали в RAG без перезапуска.
+QUESTION_INDEX: dict[str, list[str]] | None = None
+_question_index_loaded_at = 0.0
+_question_index_refresh: asyncio.Task | None = None
+
+# Клиент VseGPT
+@lru_cache(maxsize=1)
+def get_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=settings.OPENROUTER_API_KEY, # Используем старое имя переменной, но ключ VseGPT
+        base_url="OPENROUTER_API_KEY"
+    )
+
+@lru_cache(maxsize=1)
+def get_temp_dir() -> Path:
+    TEMP_DIR.mkdir(exist_ok=True)
+    return TEMP_DIR
+
+@lru_cache(maxsize=1)
 def load_system_prompt():
     if PROMPT_PATH.exists():
         return PROMPT_PATH.read_text(encoding="utf-8")
     return "Ты строгий интервьюер. Пиши термины по-русски."
 
+async def load_question_index() -> int:
+    """Загружает все вопросы в память, чтобы RAG не делал ORDER BY random() на каждый ход."""
+    global QUESTION_INDEX, _question_index_loaded_at
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Question.category, Question.text))
+        index: dict[str, list[str]] = {}
+        for category, text in result.all():
+            index.setdefault(category, []).append(text)
+    QUESTION_INDEX = index
+    _question_index_loaded_at = time.monotonic()
+    return sum(len(v) for v in index.values())
+
+async def _refresh_question_index():
+    try:
+        await load_question_index()
+    except Exception as e:
+        # Остаемся на старом индексе, повторим на следующем ходе
+        print(f"Question index refresh error: {e}")
+
+async def stop_question_index_refresh():
+    """Отменяет фоновое перечитывание индекса (при остановке приложения)."""
+    task = _question_index_refresh
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+def _schedule_question_index_refresh():
+    global _question_index_refresh
+    stale = time.monotonic() - _question_index_loaded_at > settings.QUESTION_INDEX_TTL
+    if stale and (_question_index_refresh is None or _question_index_refresh.done()):
+        _question_index_refresh = asyncio.create_task(_refresh_question_index())
+
 def clean_text_for_speech(text: str) -> str:
     """Чистит текст от *действий*, (пояснений) и Markdown перед озвучкой."""
     cleaned = re.sub(r'\*.*?\*', '', text) 
@@ -70,26 +127,115 @@ async def get_rag_context(user_text: str) -> str:
 
     print(f"DEBUG: Detected category: {category}")
 
-    async with AsyncSessionLocal() as session:
-        query = select(Question.text).where(Question.category == category).order_by(func.random()).limit(3)
-        result = await session.execute(query)
-        questions = result.scalars().all()
-        
-        if not questions:
-            return ""
-            
-        rag_text = f"\n\n[RAG - РЕКОМЕНДОВАННЫЕ ВОПРОСЫ ИЗ БАЗЫ]:\n"
-        for i, q in enumerate(questions, 1):
-            rag_text += f"{i}. {q}\n"
-        
-        rag_text += "\n[ИНСТРУКЦИЯ: Если вопросы выше на английском — ПЕРЕВЕДИ их и задавай ИСКЛЮЧИТЕЛЬНО НА РУССКОМ ЯЗЫКЕ! Используй их, чтобы проверить кандидата.]\n"
-        return rag_text
+    questions = []
+    if QUESTION_INDEX is not None:
+        _schedule_question_index_refresh()
+        pool = QUESTION_INDEX.get(category, [])
+        questions = random.sample(pool, min(3, len(pool)))
+    if not questions:
+        # Индекса еще нет или в нем пусто по категории (вопросы могли добавить после загрузки)
+        async with AsyncSessionLocal() as session:
+            query = select(Question.text).where(Question.category == category).order_by(func.random()).limit(3)
+            result = await session.execute(query)
+            questions = result.scalars().all()
+
+    if not questions:
+        return ""
+
+    rag_text = f"\n\n[RAG - РЕКОМЕНДОВАННЫЕ ВОПРОСЫ ИЗ БАЗЫ]:\n"
+    for i, q in enumerate(questions, 1):
+        rag_text += f"{i}. {q}\n"
+
+    rag_text += "\n[ИНСТРУКЦИЯ: Если вопросы выше на английском — ПЕРЕВЕДИ их и задавай ИСКЛЮЧИТЕЛЬНО НА РУССКОМ ЯЗЫКЕ! Используй их, чтобы проверить кандидата.]\n"
+    return rag_text
+
+STT_SERVICE_ERROR = "(Ошибка сервиса Google)"
+SILENCE_TEXT = "..."
+
+def _recognize_sync(wav_source) -> str:
+    """Распознавание речи (Google Free). Блокирующее, вызывать через asyncio.to_thread."""
+    import speech_recognition as sr
+
+    r = sr.Recognizer()
+    with blocking_site("stt_read_wav"):
+        with sr.AudioFile(wav_source) as source:
+            r.adjust_for_ambient_noise(source, duration=0.5)
+            audio_data = r.record(source)
+    try:
+        with blocking_site("stt_recognize"):
+            return r.recognize_google(audio_data, language="ru-RU")
+    except sr.UnknownValueError:
+        return SILENCE_TEXT
+    except sr.RequestError:
+        return STT_SERVICE_ERROR
+
+async def speech_to_text(wav_source) -> str:
+    """wav_source - путь к WAV или file-like объект с WAV."""
+    print("DEBUG: Sending audio to Google Speech...")
+    if isinstance(wav_source, Path):
+        wav_source = str(wav_source)
+    user_text = await asyncio.to_thread(_recognize_sync, wav_source)
+    print(f"DEBUG: User said: {user_text}")
+    return user_text
+
+async def generate_reply(user_text: str, history, image_url: Optional[str] = None):
+    """RAG + сборка промпта + запрос к LLM. Возвращает (ai_text, prompt, llm_ms)."""
+    system_instruction = load_system_prompt()
+
+    if user_text and user_text != SILENCE_TEXT and user_text != STT_SERVICE_ERROR:
+        rag_context = await get_rag_context(user_text)
+    else:
+        rag_context = ""
+
+    # Формирование сообщения (Текст + Картинка) в рамках бюджета токенов
+    text_payload = user_text if (user_text and user_text != SILENCE_TEXT) else "Я молчал или был шум."
+    await ensure_encoding()
+    prompt = build_prompt(system_instruction, rag_context, history, text_payload, image_url)
+    print(f"DEBUG: Prompt tokens: {prompt.total_tokens} (dropped turns: {prompt.dropped_turns})")
+
+    # Запрос к LLM (Gemini Flash)
+    print(f"DEBUG: Sending to LLM ({MODEL_NAME})...")
+    llm_started = time.perf_counter()
+    response = await get_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=prompt.messages,
+        extra_headers={"HTTP-Referer": "https://t.me/ResumeKillerBot", "X-Title": "ResumeKiller"}
+    )
+    ai_text = response.choices[0].message.content
+    llm_ms = int((time.perf_counter() - llm_started) * 1000)
+    record_prompt_metrics(prompt, getattr(response, "usage", None))
+    print(f"DEBUG: AI said: {ai_text}")
+    return ai_text, prompt, llm_ms
+
+async def _edge_tts_mp3(speech_text: str) -> bytes:
+    import edge_tts
+
+    communicate = edge_tts.Communicate(speech_text, VOICE_NAME)
+    chunks = []
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            chunks.append(chunk["data"])
+    return b"".join(chunks)
+
+async def synthesize_mp3(ai_text: str) -> bytes:
+    """
+    Озвучка (Edge TTS - Дмитрий) сразу в память, без временного файла.
+    Повторяющиеся фразы (приветствие, типовые вопросы) берутся из общего кэша.
+    """
+    speech_text = clean_text_for_speech(ai_text)
+    if not speech_text:
+        return b""
+    key = hashlib.sha256(f"{VOICE_NAME}:{speech_text}".encode()).hexdigest()
+    return await cache.get_or_set("tts", key, lambda: _edge_tts_mp3(speech_text))
 
 async def process_voice_interview(file: UploadFile, history_json: str, image: Optional[UploadFile] = None) -> dict:
+    # Ленивый импорт: после прогрева это просто поиск в sys.modules
+    from pydub import AudioSegment
+
+    temp_dir = get_temp_dir()
     unique_id = uuid.uuid4().hex
-    input_path = TEMP_DIR / f"{unique_id}.webm"
-    wav_path = TEMP_DIR / f"{unique_id}.wav"
-    output_path = TEMP_DIR / f"{unique_id}_output.mp3"
+    input_path = temp_dir / f"{unique_id}.webm"
+    wav_path = temp_dir / f"{unique_id}.wav"
 
     try:
         try:
@@ -102,88 +248,54 @@ async def process_voice_interview(file: UploadFile, history_json: str, image: Op
         if len(content) < 1024:
             return {"user_text": "...", "ai_text": "Говорите громче.", "audio_base64": ""}
 
-        with open(input_path, "wb") as f:
-            f.write(content)
+        with blocking_site("input_write"):
+            with open(input_path, "wb") as f:
+                f.write(content)
 
         # 2. Конвертация в WAV (для Google SR)
+        started = time.perf_counter()
         try:
-            sound = AudioSegment.from_file(input_path)
-            sound.export(wav_path, format="wav")
+            with blocking_site("ffmpeg_decode"):
+                sound = AudioSegment.from_file(input_path)
+                sound.export(wav_path, format="wav")
         except Exception as e:
             print(f"FFmpeg Error: {e}")
             return {"user_text": "Ошибка", "ai_text": "Проблема с аудиофайлом.", "audio_base64": ""}
 
-        # 3. Распознавание речи (Google Free)
-        print("DEBUG: Sending audio to Google Speech...")
-        r = sr.Recognizer()
-        with sr.AudioFile(str(wav_path)) as source:
-            r.adjust_for_ambient_noise(source, duration=0.5)
-            audio_data = r.record(source)
-            try:
-                user_text = await asyncio.to_thread(r.recognize_google, audio_data, language="ru-RU")
-            except sr.UnknownValueError:
-                user_text = "..."
-            except sr.RequestError:
-                user_text = "(Ошибка сервиса Google)"
-        
-        print(f"DEBUG: User said: {user_text}")
-
-        # 4. Сборка контекста (RAG + Промпт)
-        system_instruction = load_system_prompt()
-        
-        if user_text and user_text != "..." and user_text != "(Ошибка сервиса Google)":
-            rag_context = await get_rag_context(user_text) 
-            full_system = system_instruction + rag_context
-        else:
-            full_system = system_instruction
-
-        messages = [{"role": "system", "content": full_system}]
-        messages.extend(history)
-
-        # 5. Формирование сообщения (Текст + Картинка)
-        user_content = []
-        text_payload = user_text if (user_text and user_text != "...") else "Я молчал или был шум."
-        user_content.append({"type": "text", "text": text_payload})
+        # 3. Распознавание речи
+        user_text = await speech_to_text(wav_path)
+        stt_ms = int((time.perf_counter() - started) * 1000)
 
+        # 4-6. Картинка + RAG + промпт + LLM
+        image_url = None
         if image:
             print(f"DEBUG: Processing image: {image.filename}")
             image_data = await image.read()
-            base64_image = base64.b64encode(image_data).decode('utf-8')
+            with blocking_site("image_base64"):
+                base64_image = base64.b64encode(image_data).decode('utf-8')
             image_url = f"data:{image.content_type};base64,{base64_image}"
-            
-            user_content.append({
-                "type": "image_url",
-                "image_url": {"url": image_url}
-            })
-
-        messages.append({"role": "user", "content": user_content})
-
-        # 6. Запрос к LLM (Gemini Flash)
-        print(f"DEBUG: Sending to LLM ({MODEL_NAME})...")
-        response = await client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            extra_headers={"HTTP-Referer": "https://t.me/ResumeKillerBot", "X-Title": "ResumeKiller"}
-        )
-        ai_text = response.choices[0].message.content
-        print(f"DEBUG: AI said: {ai_text}")
-
-        # 7. Озвучка (Edge TTS - Дмитрий)
-        speech_text = clean_text_for_speech(ai_text)
-        if speech_text:
-            communicate = edge_tts.Communicate(speech_text, VOICE_NAME)
-            await communicate.save(str(output_path))
-        
-        if output_path.exists():
-            with open(output_path, "rb") as audio_file:
-                audio_base64 = base64.b64encode(audio_file.read()).decode('utf-8')
-        else:
-            audio_base64 = ""
+
+        ai_text, prompt, llm_ms = await generate_reply(user_text, history, image_url)
+
+        # 7. Озвучка
+        tts_started = time.perf_counter()
+        audio = await synthesize_mp3(ai_text)
+        with blocking_site("audio_base64"):
+            audio_base64 = base64.b64encode(audio).decode('utf-8') if audio else ""
+        tts_ms = int((time.perf_counter() - tts_started) * 1000)
 
         return {
             "user_text": user_text,
             "ai_text": ai_text,
-            "audio_base64": audio_base64
+            "audio_base64": audio_base64,
+            # Тайминги этапов (для аналитики, пишутся в interview_turns)
+            "timings": {
+                "stt_ms": stt_ms,
+                "llm_ms": llm_ms,
+                "tts_ms": tts_ms,
+                "total_ms": int((time.perf_counter() - started) * 1000),
+                "prompt_tokens": prompt.total_tokens,
+            },
         }
 
     except Exception as e:
@@ -191,7 +303,7 @@ async def process_voice_interview(file: UploadFile, history_json: str, image: Op
         return {"user_text": "Error", "ai_text": f"Ошибка: {str(e)}", "audio_base64": ""}
 
     finally:
-        for p in [input_path, wav_path, output_path]:
+        for p in [input_path, wav_path]:
             if p.exists(): 
                 try: os.remove(p)
                 except: pass
@@ -0,0 +1,70 @@
+import threading
+from collections import deque
+
+# Простейший реестр метрик внутри процесса.
+# Никаких внешних зависимостей: счетчики + гистограммы с окном последних значений,
+# отдаются через эндпоинт /metrics в виде JSON.
+
+HISTOGRAM_WINDOW = 1024  # Сколько последних наблюдений держим для перцентилей
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window = deque(maxlen=HISTOGRAM_WINDOW)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.window.append(value)
+
+    def summary(self) -> dict:
+        values = sorted(self.window)
+        if not values:
+            return {"count": 0}
+
+        def pct(p: float) -> float:
+            idx = min(len(values) - 1, int(round(p * (len(values) - 1))))
+            return round(values[idx], 3)
+
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3),
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "p99": pct(0.99),
+            "max": round(self.max, 3),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        # Лок нужен, т.к. часть метрик пишется из asyncio.to_thread
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._histograms: dict[str, _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = _Histogram()
+            hist.observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {name: h.summary() for name, h in self._histograms.items()},
+            }
+
+
+metrics = Metrics()
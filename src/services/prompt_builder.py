@@ -0,0 +1,241 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional
+
+from src.config import settings
+from src.services.metrics import metrics
+
+# --- Сборка промпта с бюджетом токенов ---
+# Раньше в LLM улетала вся история, которую прислал клиент. На длинных интервью
+# это упиралось в контекст и стоило денег. Здесь каждая секция (system, RAG,
+# история, реплика пользователя) считается в токенах и режется по своему бюджету.
+
+# Служебные токены формата chat-сообщений (как у OpenAI): на каждое сообщение + праймер ответа
+MESSAGE_OVERHEAD = 4
+REPLY_PRIMING = 3
+
+SUMMARY_HEADER = "[КРАТКО О РАНЕЕ СКАЗАННОМ В ИНТЕРВЬЮ]:\n"
+SUMMARY_LINE_CHARS = 160  # Сколько символов реплики оставляем в сводке
+
+
+# Кодировка tiktoken. o200k_base - токенизатор OpenAI, а отвечает Gemini, так что это
+# точный подсчет для o200k и лишь приближение к тому, что насчитает провайдер
+# (фактическое число пишется в метрику prompt_tokens_actual из usage ответа).
+# В Docker-образе файл кодировки скачивается при сборке (TIKTOKEN_CACHE_DIR),
+# иначе tiktoken качает его по сети при первой загрузке.
+ENCODING_RETRY_SECONDS = 60.0
+
+_encoding = None
+_encoding_failed_at: float | None = None
+
+
+def load_encoding():
+    """
+    Загружает кодировку. Блокирующая (чтение файла или скачивание) - вызывать
+    через asyncio.to_thread. Неудача не запоминается навсегда: повтор через ENCODING_RETRY_SECONDS.
+    """
+    global _encoding, _encoding_failed_at
+    if _encoding is not None:
+        return _encoding
+    if _encoding_failed_at is not None and time.monotonic() - _encoding_failed_at < ENCODING_RETRY_SECONDS:
+        return None
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding(settings.PROMPT_ENCODING)
+        _encoding_failed_at = None
+    except Exception as e:
+        # Без tiktoken считаем приблизительно, но сервис продолжает работать
+        print(f"WARNING: tiktoken unavailable ({e}), token counts are approximate")
+        _encoding_failed_at = time.monotonic()
+    return _encoding
+
+
+async def ensure_encoding():
+    """Догружает кодировку в потоке, если ее еще нет (на горячем пути - без await)."""
+    if _encoding is None:
+        await asyncio.to_thread(load_encoding)
+
+
+def _get_encoding():
+    # Только уже загруженная кодировка: в цикле событий никаких скачиваний
+    return _encoding
+
+
+# Кэш по тексту: system-промпт, RAG-блок и старые реплики истории
+# приходят каждый запрос одни и те же, кодируем их один раз.
+@lru_cache(maxsize=4096)
+def _count_exact(text: str) -> int:
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _get_encoding() is None:
+        # Приблизительная оценка не кэшируется, чтобы после загрузки кодировки считать точно
+        return len(text) // 3 + 1
+    return _count_exact(text)
+
+
+def truncate_to_tokens(text: str, limit: int) -> str:
+    """Обрезает текст так, чтобы он влезал в limit токенов."""
+    if limit <= 0:
+        return ""
+    if count_tokens(text) <= limit:
+        return text
+    enc = _get_encoding()
+    if enc is None:
+        # Обратно к оценке len // 3 + 1: 3 * limit - 1 символов дают ровно limit
+        return text[: limit * 3 - 1]
+    return enc.decode(enc.encode(text, disallowed_special=())[:limit])
+
+
+def _content_as_text(content) -> str:
+    """Приводит content сообщения (строка или список частей) к тексту."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(
+            part.get("text", "") for part in content
+            if isinstance(part, dict) and part.get("type") == "text"
+        )
+    return ""
+
+
+def normalize_history(history) -> List[dict]:
+    """Оставляет из присланной клиентом истории только валидные реплики user/assistant."""
+    if not isinstance(history, list):
+        return []
+    result = []
+    for item in history:
+        if not isinstance(item, dict) or item.get("role") not in ("user", "assistant"):
+            continue
+        text = _content_as_text(item.get("content")).strip()
+        if text:
+            result.append({"role": item["role"], "content": text})
+    return result
+
+
+def summarize_turns(turns: List[dict], budget: int) -> str:
+    """
+    Сжимает вытесненные реплики в короткую сводку (без обращения к LLM).
+    Если сводка не влезает в бюджет, сначала выкидываются самые старые строки.
+    """
+    if not turns or budget <= 0:
+        return ""
+
+    lines = []
+    for turn in turns:
+        who = "Кандидат" if turn["role"] == "user" else "Интервьюер"
+        text = re.sub(r"\s+", " ", turn["content"]).strip()
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS].rstrip() + "…"
+        lines.append(f"- {who}: {text}")
+
+    available = budget - count_tokens(SUMMARY_HEADER)
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        cost = count_tokens(line + "\n")
+        if used + cost > available:
+            break
+        kept.append(line)
+        used += cost
+
+    if not kept:
+        return ""
+    return SUMMARY_HEADER + "\n".join(reversed(kept))
+
+
+@dataclass
+class PromptBuild:
+    messages: List[dict]
+    sections: dict = field(default_factory=dict)  # Токены по секциям
+    total_tokens: int = 0
+    dropped_turns: int = 0
+    summarized: bool = False
+
+
+def build_prompt(
+    system_prompt: str,
+    rag_context: str,
+    history,
+    user_text: str,
+    image_url: Optional[str] = None,
+) -> PromptBuild:
+    """
+    Собирает messages для LLM в рамках бюджетов из settings.
+    История режется с самых старых реплик, вытесненное сжимается в сводку.
+    """
+    system_text = truncate_to_tokens(system_prompt, settings.PROMPT_BUDGET_SYSTEM)
+    rag_text = truncate_to_tokens(rag_context, settings.PROMPT_BUDGET_RAG)
+    user_text = truncate_to_tokens(user_text, settings.PROMPT_BUDGET_USER)
+    full_system = system_text + rag_text
+
+    # История: идем от свежих реплик к старым, пока влезаем в бюджет
+    turns = normalize_history(history)
+    costs = [count_tokens(t["content"]) + MESSAGE_OVERHEAD for t in turns]
+    summary_reserve = min(settings.PROMPT_BUDGET_SUMMARY, settings.PROMPT_BUDGET_HISTORY)
+
+    if sum(costs) <= settings.PROMPT_BUDGET_HISTORY:
+        kept, dropped = turns, []
+    else:
+        # Что-то придется выкинуть: часть бюджета отдаем под сводку старых реплик
+        limit = settings.PROMPT_BUDGET_HISTORY - summary_reserve
+        used = 0
+        first_kept = len(turns)
+        while first_kept > 0 and used + costs[first_kept - 1] <= limit:
+            first_kept -= 1
+            used += costs[first_kept]
+        kept, dropped = turns[first_kept:], turns[:first_kept]
+
+    summary = summarize_turns(dropped, summary_reserve - MESSAGE_OVERHEAD)
+
+    messages = [{"role": "system", "content": full_system}]
+    if summary:
+        messages.append({"role": "system", "content": summary})
+    messages.extend(kept)
+
+    user_content = [{"type": "text", "text": user_text}]
+    if image_url:
+        user_content.append({"type": "image_url", "image_url": {"url": image_url}})
+    messages.append({"role": "user", "content": user_content})
+
+    sections = {
+        "system": count_tokens(system_text) + MESSAGE_OVERHEAD,
+        "rag": count_tokens(rag_text),
+        "summary": count_tokens(summary) + MESSAGE_OVERHEAD if summary else 0,
+        "history": sum(count_tokens(t["content"]) + MESSAGE_OVERHEAD for t in kept),
+        "user": count_tokens(user_text) + MESSAGE_OVERHEAD,
+        "image": settings.PROMPT_IMAGE_TOKENS if image_url else 0,
+    }
+    total = sum(sections.values()) + REPLY_PRIMING
+
+    return PromptBuild(
+        messages=messages,
+        sections=sections,
+        total_tokens=total,
+        dropped_turns=len(dropped),
+        summarized=bool(summary),
+    )
+
+
+def record_prompt_metrics(build: PromptBuild, usage=None):
+    """Пишет в метрики размер промпта (наш подсчет и, если есть, фактический от провайдера)."""
+    metrics.observe("prompt_tokens_estimated", build.total_tokens)
+    for name, value in build.sections.items():
+        metrics.observe(f"prompt_tokens_{name}", value)
+    if build.dropped_turns:
+        metrics.inc("prompt_history_turns_dropped", build.dropped_turns)
+    if build.summarized:
+        metrics.inc("prompt_history_summarized")
+
+    prompt_tokens = getattr(usage, "prompt_tokens", None) if usage is not None else None
+    if prompt_tokens is not None:
+        metrics.observe("prompt_tokens_actual", prompt_tokens)
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+    if completion_tokens is not None:
+        metrics.observe("completion_tokens_actual", completion_tokens)
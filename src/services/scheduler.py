@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from src.config import settings
+from src.services.metrics import metrics
+
+# --- Честный планировщик ходов интервью ---
+# STT, LLM и TTS - общие на весь процесс. Чтобы один пользователь (или зависший клиент,
+# который долбит ретраями) не забирал всё себе:
+#   * у каждого пользователя свой token bucket (ограничение частоты);
+#   * у пользователя одновременно максимум один ход в каждом канале (Mini App, бот),
+#     новый ход отменяет старый из того же канала;
+#   * свободные слоты раздаются по weighted fair queueing, премиум весит больше.
+
+BUCKET_PRUNE_THRESHOLD = 10000  # После скольких пользователей чистим простаивающие bucket'ы
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TurnSuperseded(Exception):
+    """Ход отменен, потому что тот же пользователь прислал более новый в том же канале."""
+
+
+class _TokenBucket:
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_sec)
+        self.updated = now
+
+    def take(self) -> float:
+        """Забирает токен. Возвращает 0, если получилось, иначе сколько секунд ждать."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.refill_per_sec
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        bucket_capacity: float,
+        refill_per_sec: float,
+        name: str = "interview",
+    ):
+        self.name = name
+        self._max_concurrency = max_concurrency
+        self._bucket_capacity = bucket_capacity
+        self._refill_per_sec = refill_per_sec
+
+        self._buckets: dict[int, _TokenBucket] = {}
+        self._active: dict[tuple[str, int], asyncio.Task] = {}  # (канал, пользователь) -> текущий ход
+        self._superseded: set[asyncio.Task] = set()
+
+        self._running = 0
+        self._waiting: list = []                       # heap: (virtual_finish, seq, future)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._user_finish: dict[int, float] = {}
+
+    # --- Ограничение частоты ---
+    def _check_rate(self, user_id: int):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) > BUCKET_PRUNE_THRESHOLD:
+                self._buckets = {uid: b for uid, b in self._buckets.items() if not b.is_full()}
+            bucket = self._buckets[user_id] = _TokenBucket(self._bucket_capacity, self._refill_per_sec)
+        retry_after = bucket.take()
+        if retry_after:
+            metrics.inc(f"{self.name}_rate_limited")
+            raise RateLimited(retry_after)
+
+    # --- Слоты (WFQ) ---
+    async def _acquire(self, user_id: int, weight: float):
+        if self._running < self._max_concurrency and not self._waiting:
+            self._running += 1
+            return
+
+        start = max(self._virtual_time, self._user_finish.get(user_id, 0.0))
+        finish = start + 1.0 / max(weight, 0.01)
+        self._user_finish[user_id] = finish
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (finish, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Слот уже передали нам, но нас отменили - отдаем дальше
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        while self._waiting:
+            finish, _, future = heapq.heappop(self._waiting)
+            if future.done():
+                continue  # Ожидающий ушел (отмена)
+            self._virtual_time = finish
+            future.set_result(None)  # Слот переходит к следующему без декремента
+            return
+        self._running -= 1
+
+    @asynccontextmanager
+    async def turn(self, user_id: int, weight: float = 1.0, channel: str = "http"):
+        """
+        Выполнить ход пользователя:
+            async with scheduler.turn(user.id, weight, channel="bot"):
+                ...
+        Кидает RateLimited или TurnSuperseded. Лимит частоты и доля в очереди - общие
+        на пользователя, а вытеснение - только внутри канала: ход из Mini App не
+        отменяет голосовое в боте и наоборот.
+        """
+        self._check_rate(user_id)
+
+        task = asyncio.current_task()
+        active_key = (channel, user_id)
+        previous = self._active.get(active_key)
+        self._active[active_key] = task
+        acquired = False
+        try:
+            if previous is not None and previous is not task and not previous.done():
+                metrics.inc(f"{self.name}_turns_superseded")
+                self._superseded.add(previous)
+                previous.cancel()
+                # Ждем, пока старый ход освободит ресурсы: в работе максимум один ход на пользователя
+                await asyncio.wait({previous})
+
+            queued_at = time.monotonic()
+            await self._acquire(user_id, weight)
+            acquired = True
+            metrics.observe(f"{self.name}_queue_wait_ms", (time.monotonic() - queued_at) * 1000)
+            yield
+        except asyncio.CancelledError:
+            if task in self._superseded:
+                task.uncancel()
+                raise TurnSuperseded()
+            raise
+        finally:
+            self._superseded.discard(task)
+            if acquired:
+                self._release()
+            if self._active.get(active_key) is task:
+                del self._active[active_key]
+                if self._user_finish.get(user_id, 0.0) <= self._virtual_time:
+                    self._user_finish.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._running,
+            "waiting": sum(1 for _, _, f in self._waiting if not f.done()),
+            "active_users": len({user_id for _, user_id in self._active}),
+        }
+
+
+interview_scheduler = FairScheduler(
+    max_concurrency=settings.INTERVIEW_MAX_CONCURRENCY,
+    bucket_capacity=settings.INTERVIEW_RATE_BURST,
+    refill_per_sec=settings.INTERVIEW_RATE_PER_MINUTE / 60,
+)
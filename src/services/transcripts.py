@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from sqlalchemy import insert, select
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.models.interview_turn import InterviewTurn
+from src.services.metrics import metrics
+
+# --- Запись ходов интервью ---
+# Запрос не ждет БД: ход кладется в очередь, а фоновый воркер пишет пачками
+# (по TURNS_BATCH_SIZE или раз в TURNS_FLUSH_INTERVAL секунд, что наступит раньше).
+
+_STOP = object()  # Маркер остановки воркера (встает в очередь после всех ходов)
+
+
+class TurnRecorder:
+    def __init__(self, batch_size: int, flush_interval: float, queue_size: int):
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: asyncio.Task | None = None
+
+    def record(self, session_id: str, user_id: int, user_text: str, ai_text: str, timings: dict):
+        """Ставит ход в очередь на запись. Не блокирует и не ходит в БД."""
+        row = {
+            "session_id": session_id,
+            "user_id": user_id,
+            "user_text": user_text,
+            "ai_text": ai_text,
+            "stt_ms": timings.get("stt_ms"),
+            "llm_ms": timings.get("llm_ms"),
+            "tts_ms": timings.get("tts_ms"),
+            "total_ms": timings.get("total_ms"),
+            "prompt_tokens": timings.get("prompt_tokens"),
+        }
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            metrics.inc("turns_dropped")
+
+    async def _write(self, rows: list):
+        started = time.monotonic()
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(InterviewTurn), rows)
+                await session.commit()
+        except Exception as e:
+            print(f"Turns flush error: {e}")
+            metrics.inc("turns_flush_errors")
+            return
+        metrics.observe("turns_flush_ms", (time.monotonic() - started) * 1000)
+        metrics.inc("turns_written", len(rows))
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            rows = [first]
+            deadline = loop.time() + self._flush_interval
+            # Добираем пачку, но не дольше flush_interval с момента первого хода
+            while len(rows) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                rows.append(row)
+            await self._write(rows)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        """Дописывает всё, что уже в очереди, и останавливает воркер."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+
+async def get_session_turns(session_id: str, user_id: int, after_id: int, limit: int):
+    """
+    Страница ходов сессии (keyset): id > after_id, по возрастанию id.
+    Берем limit + 1 строку, чтобы понять, есть ли следующая страница.
+    """
+    async with AsyncSessionLocal() as session:
+        query = (
+            select(InterviewTurn)
+            .where(
+                InterviewTurn.session_id == session_id,
+                InterviewTurn.user_id == user_id,
+                InterviewTurn.id > after_id,
+            )
+            .order_by(InterviewTurn.id)
+            .limit(limit + 1)
+        )
+        result = await session.execute(query)
+        turns = list(result.scalars().all())
+
+    next_after_id = turns[limit - 1].id if len(turns) > limit else None
+    return turns[:limit], next_after_id
+
+
+turn_recorder = TurnRecorder(
+    batch_size=settings.TURNS_BATCH_SIZE,
+    flush_interval=settings.TURNS_FLUSH_INTERVAL,
+    queue_size=settings.TURNS_QUEUE_SIZE,
+)
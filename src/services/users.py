@@ -0,0 +1,123 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.models.user import User
+from src.schemas import TelegramUser
+from src.services.cache import cache
+from src.services.metrics import metrics
+
+# --- Реестр пользователей с отложенной записью (write-behind) ---
+# get_current_user вызывается на каждый запрос, и ходить в БД оттуда дорого.
+# Поэтому авторизация только помечает пользователя "грязным" в памяти,
+# а фоновая задача раз в USER_FLUSH_INTERVAL секунд пишет всех пачкой одним upsert'ом.
+
+FLUSH_BATCH_SIZE = 500  # Строк в одном INSERT ... ON CONFLICT
+
+
+class UserRegistry:
+    def __init__(self, flush_interval: float):
+        self._flush_interval = flush_interval
+        self._dirty: dict[int, tuple[TelegramUser, datetime]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    def touch(self, user: TelegramUser):
+        """Отмечает активность пользователя. Без БД, вызывается на горячем пути."""
+        self._dirty[user.id] = (user, datetime.now(timezone.utc))
+
+    async def is_premium(self, user_id: int) -> bool:
+        """Read-through кэш флага is_premium из таблицы users (namespace "premium")."""
+        async def load():
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(select(User.is_premium).where(User.id == user_id))
+                return bool(result.scalar_one_or_none())
+
+        return await cache.get_or_set_json("premium", str(user_id), load)
+
+    async def flush(self) -> int:
+        """Пишет накопленных пользователей в БД. Возвращает число строк."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+
+            rows = [
+                {
+                    "id": user.id,
+                    "username": user.username,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                    "is_premium": False,  # Только для новых строк, при конфликте не трогаем
+                    "last_seen_at": seen_at,
+                }
+                for user, seen_at in batch.values()
+            ]
+
+            started = time.monotonic()
+            try:
+                async with AsyncSessionLocal() as session:
+                    for i in range(0, len(rows), FLUSH_BATCH_SIZE):
+                        stmt = pg_insert(User).values(rows[i:i + FLUSH_BATCH_SIZE])
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[User.id],
+                            set_={
+                                "username": stmt.excluded.username,
+                                "first_name": stmt.excluded.first_name,
+                                "last_name": stmt.excluded.last_name,
+                                "last_seen_at": stmt.excluded.last_seen_at,
+                                "updated_at": func.now(),
+                            },
+                        )
+                        await session.execute(stmt)
+                    await session.commit()
+            except Exception as e:
+                # Возвращаем пачку обратно (более свежие отметки из _dirty важнее)
+                print(f"User flush error: {e}")
+                metrics.inc("user_flush_errors")
+                self._restore(batch)
+                return 0
+            except BaseException:
+                # Отмена посреди записи: пачка не должна потеряться
+                self._restore(batch)
+                raise
+
+            metrics.observe("user_flush_ms", (time.monotonic() - started) * 1000)
+            metrics.observe("user_flush_rows", len(rows))
+            return len(rows)
+
+    def _restore(self, batch: dict):
+        for user_id, entry in batch.items():
+            self._dirty.setdefault(user_id, entry)
+
+    async def _flush_loop(self):
+        # Ждем не sleep'ом, а событием остановки: stop() будит цикл, а не отменяет запись
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Останавливает фоновую запись и сбрасывает остатки в БД."""
+        if self._task is not None:
+            # Без cancel(): идущий flush доработает, цикл сделает последний проход и выйдет
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+user_registry = UserRegistry(flush_interval=settings.USER_FLUSH_INTERVAL)
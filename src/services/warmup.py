@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+import time
+
+from sqlalchemy import text
+
+from src.config import settings
+from src.database import engine
+from src.services import interview
+from src.services.prompt_builder import count_tokens, load_encoding
+
+# --- Прогрев при старте ---
+# Запускается фоновой задачей из lifespan, чтобы первый пользователь не платил за
+# импорт медиа-стека, открытие пула БД и загрузку промптов/вопросов.
+# /ready отвечает 200 только после окончания прогрева и пока критичные шаги (БД, индекс
+# вопросов) не в ошибке: упавшие критичные шаги повторяются в фоне до успеха.
+
+CRITICAL_STEPS = ("db_pool", "question_index")
+RETRY_INITIAL_SECONDS = 2.0
+RETRY_MAX_SECONDS = 60.0
+
+
+class WarmupState:
+    def __init__(self):
+        self.finished = False
+        self.steps: dict[str, float] = {}  # Шаг -> длительность в мс
+        self.errors: dict[str, str] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and not any(name in self.errors for name in CRITICAL_STEPS)
+
+    def as_dict(self) -> dict:
+        return {"ready": self.ready, "steps_ms": self.steps, "errors": self.errors}
+
+
+warmup_state = WarmupState()
+
+
+async def _step(name: str, coro) -> bool:
+    started = time.perf_counter()
+    try:
+        await coro
+    except Exception as e:
+        # Ошибка шага не валит сервис: некритичное догрузится лениво, критичное - повторим
+        print(f"Warmup step '{name}' failed: {e}")
+        warmup_state.errors[name] = str(e)
+        return False
+    finally:
+        warmup_state.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+    warmup_state.errors.pop(name, None)
+    return True
+
+
+async def _import_heavy_modules():
+    for name in interview.HEAVY_MODULES:
+        await asyncio.to_thread(importlib.import_module, name)
+    # Клиент создаем после импорта openai, чтобы не блокировать цикл импортом
+    interview.get_client()
+
+
+async def _open_db_pool():
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Одновременные подключения, чтобы в пуле осталось несколько готовых соединений
+    await asyncio.gather(*(ping() for _ in range(settings.DB_WARM_CONNECTIONS)))
+
+
+async def _load_prompts():
+    await asyncio.to_thread(interview.get_temp_dir)
+    prompt = await asyncio.to_thread(interview.load_system_prompt)
+    # Заодно загружаем кодировку tiktoken и кэшируем токены system-промпта
+    await asyncio.to_thread(load_encoding)
+    await asyncio.to_thread(count_tokens, prompt)
+
+
+async def warm_up(retry_critical: bool = True):
+    await asyncio.gather(
+        _step("heavy_imports", _import_heavy_modules()),
+        _step("db_pool", _open_db_pool()),
+        _step("prompts", _load_prompts()),
+    )
+    # Индекс вопросов грузим после пула (использует его соединения)
+    await _step("question_index", interview.load_question_index())
+    warmup_state.finished = True
+    print(f"Warmup finished: {warmup_state.steps}")
+    if retry_critical:
+        await _retry_critical_steps()
+
+
+async def _retry_critical_steps():
+    """Повторяет упавшие критичные шаги с растущей паузой, пока все не пройдут."""
+    retries = {"db_pool": _open_db_pool, "question_index": interview.load_question_index}
+    delay = RETRY_INITIAL_SECONDS
+    while failed := [name for name in CRITICAL_STEPS if name in warmup_state.errors]:
+        await asyncio.sleep(delay)
+        for name in failed:
+            # Порядок важен: без пула индекс вопросов все равно не загрузится
+            if not await _step(name, retries[name]()):
+                break
+        delay = min(delay * 2, RETRY_MAX_SECONDS)
+    print("Warmup: critical steps recovered")
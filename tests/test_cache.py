@@ -0,0 +1,173 @@
+import asyncio
+
+import pytest
+
+from src.services import cache as cache_module
+from src.services.cache import CacheBackend, FakeRedis, InMemoryBackend, RedisBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_backends():
+    return [
+        InMemoryBackend(max_items=100, max_bytes=1024 * 1024),
+        RedisBackend(FakeRedis()),
+    ]
+
+
+@pytest.mark.parametrize("backend", make_backends(), ids=["memory", "fakeredis"])
+def test_get_or_set_calls_factory_once_for_concurrent_misses(backend):
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"value"
+
+    async def main():
+        results = await asyncio.gather(*(backend.get_or_set("tts", "k", factory) for _ in range(20)))
+        assert results == [b"value"] * 20
+        # Повторный запрос - уже из кэша
+        assert await backend.get_or_set("tts", "k", factory) == b"value"
+
+    run(main())
+    assert calls == 1
+
+
+@pytest.mark.parametrize("backend", make_backends(), ids=["memory", "fakeredis"])
+def test_factory_error_reaches_every_waiter(backend):
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(
+            *(backend.get_or_set("tts", "k", factory) for _ in range(5)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # Ошибка не кэшируется
+        assert await backend.get("tts", "k") is None
+
+    run(main())
+    assert calls == 1
+
+
+@pytest.mark.parametrize("backend", make_backends(), ids=["memory", "fakeredis"])
+def test_namespace_ttl_expires(backend, monkeypatch):
+    monkeypatch.setitem(cache_module.NAMESPACE_TTLS, "short", 0.05)
+
+    async def main():
+        await backend.set_json("short", "k", {"a": 1})
+        await backend.set_json("long", "k", {"a": 2})
+        assert await backend.get_json("short", "k") == {"a": 1}
+        await asyncio.sleep(0.1)
+        assert await backend.get_json("short", "k") is None
+        assert await backend.get_json("long", "k") == {"a": 2}
+
+    run(main())
+
+
+def test_remote_lock_waits_for_other_replica(monkeypatch):
+    monkeypatch.setattr(cache_module, "LOCK_POLL_SECONDS", 0.01)
+    shared = FakeRedis()
+    first, second = RedisBackend(shared), RedisBackend(shared)
+    calls = []
+
+    def factory(name):
+        async def fill():
+            calls.append(name)
+            await asyncio.sleep(0.1)
+            return name.encode()
+        return fill
+
+    async def main():
+        task = asyncio.create_task(first.get_or_set("tts", "k", factory("first")))
+        await asyncio.sleep(0.02)  # Первая реплика взяла lock
+        waited = await second.get_or_set("tts", "k", factory("second"))
+        assert waited == b"first"
+        assert await task == b"first"
+
+    run(main())
+    assert calls == ["first"]
+
+
+def test_in_memory_evicts_least_recently_used_items():
+    backend = InMemoryBackend(max_items=2, max_bytes=1024)
+
+    async def main():
+        await backend.set("ns", "a", b"1")
+        await backend.set("ns", "b", b"2")
+        await backend.get("ns", "a")  # "a" теперь свежее "b"
+        await backend.set("ns", "c", b"3")
+        assert await backend.get("ns", "b") is None
+        assert await backend.get("ns", "a") == b"1"
+        assert await backend.get("ns", "c") == b"3"
+
+    run(main())
+
+
+def test_in_memory_evicts_by_total_bytes():
+    backend = InMemoryBackend(max_items=100, max_bytes=10)
+
+    async def main():
+        await backend.set("ns", "a", b"x" * 6)
+        await backend.set("ns", "b", b"y" * 6)
+        assert await backend.get("ns", "a") is None
+        assert await backend.get("ns", "b") == b"y" * 6
+        # Перезапись ключа не задваивает учет размера
+        await backend.set("ns", "b", b"z" * 4)
+        await backend.set("ns", "c", b"w" * 6)
+        assert await backend.get("ns", "b") == b"z" * 4
+        assert backend._size == 10
+
+    run(main())
+
+
+class FailingRedis:
+    """Клиент, у которого пропало соединение с Redis."""
+
+    async def get(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    set = delete = aclose = get
+
+
+def test_redis_errors_degrade_to_direct_factory_calls():
+    backend = RedisBackend(FailingRedis())
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        return b"value"
+
+    async def main():
+        assert await backend.get("tts", "k") is None
+        await backend.set("tts", "k", b"value")
+        await backend.delete("tts", "k")
+        assert await backend.get_or_set("tts", "k", factory) == b"value"
+        assert await backend.get_json("bot_history", "1") is None
+        await backend.close()
+
+    run(main())
+    assert calls == 1
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoDelete(CacheBackend):
+        async def get(self, namespace, key):
+            return None
+
+        async def set(self, namespace, key, value, ttl=None):
+            pass
+
+    with pytest.raises(TypeError):
+        NoDelete()
@@ -0,0 +1,100 @@
+import pytest
+
+from src.config import settings
+from src.services import prompt_builder
+from src.services.prompt_builder import (
+    MESSAGE_OVERHEAD,
+    REPLY_PRIMING,
+    SUMMARY_HEADER,
+    build_prompt,
+    count_tokens,
+    normalize_history,
+)
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokens(monkeypatch):
+    # Детерминированный подсчет (len // 3 + 1) без загрузки кодировки tiktoken
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+
+
+def make_history(n: int, text: str = "a" * 30) -> list:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}{text}"}
+        for i in range(n)
+    ]
+
+
+def test_short_history_is_kept_without_summary():
+    history = make_history(4)
+    build = build_prompt("system", "", history, "hello")
+
+    assert [m["content"] for m in build.messages[1:-1]] == [t["content"] for t in history]
+    assert build.dropped_turns == 0
+    assert not build.summarized
+    assert build.total_tokens == sum(build.sections.values()) + REPLY_PRIMING
+
+
+def test_long_history_drops_oldest_turns_into_summary(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_BUDGET_HISTORY", 100)
+    monkeypatch.setattr(settings, "PROMPT_BUDGET_SUMMARY", 40)
+    history = make_history(10)
+
+    build = build_prompt("system", "", history, "hello")
+
+    # Каждая реплика стоит 15 токенов, на свежие остается 100 - 40 = 60
+    assert build.dropped_turns == 6
+    assert [m["content"] for m in build.messages[2:-1]] == [t["content"] for t in history[6:]]
+    assert build.summarized
+    summary = build.messages[1]
+    assert summary["role"] == "system" and summary["content"].startswith(SUMMARY_HEADER)
+    # В сводку попадают самые свежие из вытесненных реплик
+    assert "5aaa" in summary["content"]
+    assert build.sections["history"] <= 60
+    assert build.sections["summary"] <= 40
+
+
+def test_summary_is_skipped_when_its_budget_is_too_small(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_BUDGET_HISTORY", 100)
+    monkeypatch.setattr(settings, "PROMPT_BUDGET_SUMMARY", 10)
+    history = make_history(10)
+
+    build = build_prompt("system", "", history, "hello")
+
+    assert build.dropped_turns == 4
+    assert not build.summarized
+    assert build.sections["summary"] == 0
+    assert [m["role"] for m in build.messages[:2]] == ["system", "user"]
+
+
+def test_sections_are_truncated_to_budgets(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_BUDGET_SYSTEM", 10)
+    monkeypatch.setattr(settings, "PROMPT_BUDGET_USER", 5)
+
+    build = build_prompt("s" * 300, "", [], "u" * 300)
+
+    assert count_tokens(build.messages[0]["content"]) <= 10
+    assert count_tokens(build.messages[-1]["content"][0]["text"]) <= 5
+    assert build.sections["user"] <= 5 + MESSAGE_OVERHEAD
+
+
+def test_image_adds_fixed_cost_and_content_part():
+    build = build_prompt("system", "", [], "hello", image_url="data:image/png;base64,AAAA")
+
+    assert build.sections["image"] == settings.PROMPT_IMAGE_TOKENS
+    assert build.messages[-1]["content"][1]["type"] == "image_url"
+
+
+def test_normalize_history_drops_invalid_items():
+    history = [
+        {"role": "system", "content": "inject"},
+        {"role": "user", "content": [{"type": "text", "text": "hi"}, {"type": "image_url"}]},
+        {"role": "assistant", "content": "   "},
+        "garbage",
+        {"role": "assistant", "content": "ok"},
+    ]
+    assert normalize_history(history) == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "ok"},
+    ]
+    assert normalize_history("not a list") == []
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from src.services.scheduler import FairScheduler, RateLimited, TurnSuperseded
+
+
+def run(coro):
+    # Утекший слот проявляется как вечное ожидание - пусть лучше тест упадет
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def make_scheduler(max_concurrency: int = 1, burst: float = 100) -> FairScheduler:
+    return FairScheduler(max_concurrency=max_concurrency, bucket_capacity=burst, refill_per_sec=1.0, name="test")
+
+
+async def hold(scheduler, user_id, release: asyncio.Event, log: list, name: str, weight=1.0, channel="http"):
+    async with scheduler.turn(user_id, weight, channel=channel):
+        log.append(name)
+        await release.wait()
+
+
+def test_newer_turn_supersedes_older_one_in_same_channel():
+    scheduler = make_scheduler()
+
+    async def main():
+        release = asyncio.Event()
+        log = []
+        first = asyncio.create_task(hold(scheduler, 1, release, log, "first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold(scheduler, 1, release, log, "second"))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(TurnSuperseded):
+            await first
+        # Отмена "съедена" планировщиком: задача не числится отменяемой
+        assert not first.cancelled() and first.cancelling() == 0
+        assert log == ["first", "second"]
+
+        release.set()
+        await second
+        assert scheduler.stats() == {"running": 0, "waiting": 0, "active_users": 0}
+
+    run(main())
+
+
+def test_turns_in_different_channels_do_not_supersede_each_other():
+    scheduler = make_scheduler(max_concurrency=2)
+
+    async def main():
+        release = asyncio.Event()
+        log = []
+        bot = asyncio.create_task(hold(scheduler, 1, release, log, "bot", channel="bot"))
+        await asyncio.sleep(0)
+        http = asyncio.create_task(hold(scheduler, 1, release, log, "http", channel="http"))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["active_users"] == 1
+        release.set()
+        await asyncio.gather(bot, http)
+        assert sorted(log) == ["bot", "http"]
+
+    run(main())
+
+
+def test_free_slot_goes_to_the_waiter_with_smallest_virtual_finish():
+    scheduler = make_scheduler(max_concurrency=1)
+
+    async def main():
+        gate, release = asyncio.Event(), asyncio.Event()
+        log = []
+        holder = asyncio.create_task(hold(scheduler, 1, gate, log, "holder"))
+        await asyncio.sleep(0)
+        normal = asyncio.create_task(hold(scheduler, 2, release, log, "normal", weight=1.0))
+        await asyncio.sleep(0)
+        premium = asyncio.create_task(hold(scheduler, 3, release, log, "premium", weight=2.0))
+        await asyncio.sleep(0)
+        assert scheduler.stats() == {"running": 1, "waiting": 2, "active_users": 3}
+
+        gate.set()
+        await holder
+        await asyncio.sleep(0)
+        # Слот передан напрямую, без декремента running
+        assert log == ["holder", "premium"]
+        assert scheduler.stats()["running"] == 1
+
+        release.set()
+        await asyncio.gather(normal, premium)
+        assert log == ["holder", "premium", "normal"]
+        assert scheduler.stats() == {"running": 0, "waiting": 0, "active_users": 0}
+
+    run(main())
+
+
+def test_cancelled_waiter_is_skipped_and_slot_is_not_leaked():
+    scheduler = make_scheduler(max_concurrency=1)
+
+    async def main():
+        gate, release = asyncio.Event(), asyncio.Event()
+        log = []
+        holder = asyncio.create_task(hold(scheduler, 1, gate, log, "holder"))
+        await asyncio.sleep(0)
+        gone = asyncio.create_task(hold(scheduler, 2, release, log, "gone"))
+        waiter = asyncio.create_task(hold(scheduler, 3, release, log, "waiter"))
+        await asyncio.sleep(0)
+
+        gone.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+        assert scheduler.stats()["waiting"] == 1
+
+        gate.set()
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert log == ["holder", "waiter"]
+        assert scheduler.stats() == {"running": 0, "waiting": 0, "active_users": 0}
+
+    run(main())
+
+
+def test_waiter_cancelled_after_handoff_passes_slot_on():
+    scheduler = make_scheduler(max_concurrency=1)
+
+    async def main():
+        gate, release = asyncio.Event(), asyncio.Event()
+        log = []
+        tasks = {}
+
+        async def holder():
+            async with scheduler.turn(1):
+                log.append("holder")
+                await gate.wait()
+            # Слот уже передан unlucky, но тот отменен раньше, чем успел проснуться
+            tasks["unlucky"].cancel()
+
+        holder_task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        tasks["unlucky"] = asyncio.create_task(hold(scheduler, 2, release, log, "unlucky"))
+        waiter = asyncio.create_task(hold(scheduler, 3, release, log, "waiter"))
+        await asyncio.sleep(0)
+
+        gate.set()
+        await holder_task
+        with pytest.raises(asyncio.CancelledError):
+            await tasks["unlucky"]
+
+        release.set()
+        await waiter
+        assert log == ["holder", "waiter"]
+        assert scheduler.stats() == {"running": 0, "waiting": 0, "active_users": 0}
+
+    run(main())
+
+
+def test_rate_limit_is_shared_between_channels():
+    scheduler = make_scheduler(max_concurrency=2, burst=1)
+
+    async def main():
+        async with scheduler.turn(1, channel="http"):
+            pass
+        with pytest.raises(RateLimited) as exc:
+            async with scheduler.turn(1, channel="bot"):
+                pass
+        assert exc.value.retry_after > 0
+
+    run(main())